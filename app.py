@@ -1,7 +1,10 @@
 from flask import Flask, jsonify
 from config import Config
-from db import close_db
-from flask_jwt_extended import JWTManager
+from db import add_query_headers, close_db, db_cli
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt
+from cache import get_cache
+from metrics import init_metrics
+from revocation import is_token_revoked
 from flasgger import Swagger
 import yaml
 import os
@@ -15,6 +18,9 @@ def create_app():
     # Initialize JWT
     jwt = JWTManager(app)
 
+    # Reject logged-out tokens and tokens issued before a password change or role demotion
+    jwt.token_in_blocklist_loader(is_token_revoked)
+
     # Load the main Swagger YAML file
     swagger_path = os.path.join(os.path.dirname(__file__), 'docs', 'swagger.yaml')
     with open(swagger_path, 'r') as f:
@@ -26,6 +32,18 @@ def create_app():
     # Register teardown function for closing the DB connection
     app.teardown_appcontext(close_db)
 
+    # Report per-request SQL statement count and time
+    app.after_request(add_query_headers)
+
+    # Request latency histograms, pool and cache gauges served at /metrics
+    init_metrics(app)
+
+    # Register `flask db ...` maintenance commands; these modules attach their commands to db_cli on import
+    import migrate  # noqa: F401
+    import ratings  # noqa: F401
+    import seed  # noqa: F401
+    app.cli.add_command(db_cli)
+
     # Import and register blueprints
     from auth.routes import auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -73,6 +91,14 @@ def create_app():
             json.dump(swagger_spec, f, indent=4) 
         
         return jsonify({"message": "Swagger specification exported successfully", "file_path": output_path})
+
+    # Catalog cache counters, used to size CATALOG_CACHE_MAX_ENTRIES / CATALOG_CACHE_TTL
+    @app.route('/cache/stats', methods=['GET'])
+    @jwt_required()
+    def cache_stats():
+        if get_jwt().get('role', 'user') != 'admin':
+            return jsonify({'message': 'Admins only!'}), 403
+        return jsonify(get_cache().stats()), 200
     
     return app
 
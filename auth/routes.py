@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import (
-    JWTManager, create_access_token, jwt_required, get_jwt_identity
+    JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 )
-from db import get_db
+from db import close_db, duplicate_key, get_db
+from passwords import HasherBusy, busy_response, get_password_hasher, hash_password
+from ratelimit import rate_limit
+from revocation import issued_at_claims, revoke_token, token_revoked
 from flasgger import swag_from
 import os
 
@@ -29,6 +31,7 @@ def protected():
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('5/minute')
 @swag_from(os.path.join(current_dir, 'docs', 'register.yml'))
 def register():
     data = request.get_json()
@@ -46,20 +49,17 @@ def register():
     if not name or not email or not password:
         return jsonify({'message': 'Name, email, and password are required.'}), 400
 
-    # Hash the password
-    hashed_password = generate_password_hash(password)
+    # Hash the password (in the hashing pool; 503 when it is saturated)
+    try:
+        hashed_password = hash_password(password)
+    except HasherBusy:
+        return busy_response()
 
     # Connect to the database
     db = get_db()
     cursor = db.cursor()
 
-    # Check if the user already exists
-    cursor.execute('SELECT * FROM User WHERE email = %s', (email,))
-    existing_user = cursor.fetchone()
-    if existing_user:
-        return jsonify({'message': 'User already exists.'}), 400
-
-    # Insert the new user
+    # Insert the new user; the unique keys on email and phone_number reject duplicates
     try:
         cursor.execute(
         'INSERT INTO User (name, email, password, phone_number, role) VALUES (%s, %s, %s, %s, %s)',
@@ -69,10 +69,16 @@ def register():
         return jsonify({'message': 'User registered successfully.'}), 201
     except Exception as e:
         db.rollback()
+        key = duplicate_key(e)
+        if key == 'phone_number':
+            return jsonify({'message': 'Phone number is already in use.'}), 400
+        if key is not None:
+            return jsonify({'message': 'User already exists.'}), 400
         return jsonify({'error': str(e)}), 500
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('10/minute')
 @swag_from(os.path.join(current_dir, 'docs', 'login.yml'))
 def login():
     data = request.get_json()
@@ -92,19 +98,62 @@ def login():
     # Retrieve the user from the database
     cursor.execute('SELECT * FROM User WHERE email = %s', (email,))
     user = cursor.fetchone()
+    # Give the connection back while the password is checked, so waiting logins do not hold pool slots
+    close_db()
+
+    hasher = get_password_hasher()
+    try:
+        valid = user is not None and hasher.verify(user['password'], password)
+    except HasherBusy:
+        return busy_response()
+
+    if valid:
+        # Move the stored hash to PASSWORD_HASH_METHOD while the plain password is at hand
+        if hasher.needs_rehash(user['password']):
+            try:
+                new_hash = hasher.hash(password)
+            except HasherBusy:
+                new_hash = None  # Not worth failing the login over; the next one retries
+            if new_hash is not None:
+                db = get_db()
+                cursor = db.cursor()
+                cursor.execute(
+                    'UPDATE User SET password = %s WHERE user_id = %s AND password = %s',
+                    (new_hash, user['user_id'], user['password'])
+                )
+                db.commit()
+                hasher.record_rehash(cursor.rowcount)
 
-    if user and check_password_hash(user['password'], password):
         # Create JWT token
         identity = str(user['user_id'])  # Convert to string if necessary
 
         # Pass additional claims
         additional_claims = {
             'email': user['email'],
-            'role': user.get('role', 'user')
+            'role': user.get('role', 'user'),
+            **issued_at_claims()
         }
         access_token = create_access_token(identity=identity, additional_claims=additional_claims)
         return jsonify({'token': access_token}), 200
     else:
         return jsonify({'message': 'Invalid credentials.'}), 401
-    
 
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'logout.yml'))
+def logout():
+    claims = get_jwt()
+
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        revoke_token(cursor, claims)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    token_revoked(claims)
+    return jsonify({'message': 'Logged out.'}), 200
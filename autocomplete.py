@@ -0,0 +1,322 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+
+import pymysql
+from flask import current_app
+
+from db import get_db
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(text):
+    return _WHITESPACE.sub(' ', text.lower()).lstrip()
+
+
+def name_keys(name):
+    # The full name and every word-boundary suffix, so 'head' finds 'Wireless Headphones'
+    words = normalize(name or '').split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+# Prefixes up to this many characters match a large part of the catalog, so their best ids are
+# ranked once per build; longer prefixes select a narrow range of the sorted keys
+TOP_PREFIX_LENGTH = 3
+# Changes held on top of the last build before a rebuild folds them in
+MAX_CHANGES = 1000
+
+
+class PrefixIndex:
+    # Sorted (key, id) pairs searched with bisect; entries hold the payload and the ranking score.
+    # Built indexes also keep the best top_k ids of every short prefix.
+    def __init__(self, top_k=0):
+        self.top_k = top_k
+        self._keys = []
+        self._entries = {}
+        self._top = {}
+
+    @classmethod
+    def from_items(cls, items, top_k=0):
+        index = cls(top_k)
+        heaps = {}
+        for item_id, name, score, payload in items:
+            keys = name_keys(name)
+            index._entries[item_id] = (keys, score, payload)
+            index._keys.extend((key, item_id) for key in keys)
+            if not top_k:
+                continue
+            rank = (score, -item_id)
+            for prefix in {key[:n] for key in keys for n in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1)}:
+                heap = heaps.setdefault(prefix, [])
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (rank, item_id))
+                elif rank > heap[0][0]:
+                    heapq.heapreplace(heap, (rank, item_id))
+        index._keys.sort()
+        index._top = {prefix: [item_id for _, item_id in sorted(heap, reverse=True)] for prefix, heap in heaps.items()}
+        return index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def copy(self):
+        index = PrefixIndex(self.top_k)
+        index._keys = list(self._keys)
+        index._entries = dict(self._entries)
+        index._top = self._top
+        return index
+
+    def get(self, item_id):
+        entry = self._entries.get(item_id)
+        return entry and (entry[1], entry[2])
+
+    def rank(self, item_id):
+        return (self._entries[item_id][1], -item_id)
+
+    def put(self, item_id, name, score, payload):
+        # For change sets only; the precomputed top lists are not updated
+        self.remove(item_id)
+        keys = name_keys(name)
+        self._entries[item_id] = (keys, score, payload)
+        for key in keys:
+            bisect.insort(self._keys, (key, item_id))
+
+    def remove(self, item_id):
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            i = bisect.bisect_left(self._keys, (key, item_id))
+            if i < len(self._keys) and self._keys[i] == (key, item_id):
+                del self._keys[i]
+
+    def search(self, prefix, k, skip=frozenset()):
+        # Best k (rank, payload) pairs for a normalized prefix, leaving out the ids in skip
+        if not prefix:
+            return []
+        ranked = self._top.get(prefix)
+        if ranked is not None:
+            best = [item_id for item_id in ranked if item_id not in skip][:k]
+            # A list shorter than top_k already holds every match
+            if len(best) == k or len(ranked) < self.top_k:
+                return [(self.rank(item_id), self._entries[item_id][2]) for item_id in best]
+        matches = set()
+        i = bisect.bisect_left(self._keys, (prefix,))
+        while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+            matches.add(self._keys[i][1])
+            i += 1
+        best = heapq.nlargest(k, matches - skip, key=self.rank)
+        return [(self.rank(item_id), self._entries[item_id][2]) for item_id in best]
+
+
+class _Changes:
+    # Writes since the last build: every id touched, removed ones included, and the current state
+    # of those still present
+    def __init__(self):
+        self.ids = set()
+        self.index = PrefixIndex()
+
+    def copy(self):
+        changes = _Changes()
+        changes.ids = set(self.ids)
+        changes.index = self.index.copy()
+        return changes
+
+
+def _product_item(row):
+    # Most reviewed first, then best rated
+    average = row['average_rating']
+    return (
+        row['product_id'], row['name'],
+        (row['rating_count'], float(average) if average is not None else 0.0),
+        {'product_id': row['product_id'], 'name': row['name'],
+         'rating_count': row['rating_count'], 'average_rating': average},
+    )
+
+
+def _manufacturer_item(row):
+    rating = row['rating']
+    return (
+        row['manufacturer_id'], row['name'],
+        (float(rating) if rating is not None else 0.0,),
+        {'manufacturer_id': row['manufacturer_id'], 'name': row['name'], 'rating': rating},
+    )
+
+
+def _load(query, make_item, top_k):
+    # Unbuffered so a large catalog is indexed without materialising every row first
+    cursor = get_db().cursor(pymysql.cursors.SSDictCursor)
+    try:
+        cursor.execute(query)
+        return PrefixIndex.from_items((make_item(row) for row in cursor), top_k)
+    finally:
+        cursor.close()
+
+
+class Autocomplete:
+    # Built on first use and rebuilt in the background every rebuild_seconds, or once MAX_CHANGES
+    # writes have piled up, so that changes made by other workers and rating changes are picked up.
+    # This worker's own writes apply immediately through a change set layered over the last build.
+    # Searches run without the lock on a snapshot that no writer modifies.
+    def __init__(self, rebuild_seconds=300, top_k=50):
+        self.rebuild_seconds = rebuild_seconds
+        self.top_k = top_k
+        self._indexes = None
+        self._changes = None
+        self._snapshot = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Changes made while a rebuild is reading the tables, replayed onto the new indexes
+        self._pending = None
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = []
+        try:
+            indexes = {
+                'product': _load('''
+                    SELECT p.product_id, p.name, COALESCE(s.rating_count, 0) AS rating_count, s.average_rating
+                    FROM Product p
+                    LEFT JOIN ProductRatingStats s ON s.product_id = p.product_id
+                ''', _product_item, self.top_k),
+                'manufacturer': _load('SELECT manufacturer_id, name, rating FROM Manufacturer',
+                                      _manufacturer_item, self.top_k),
+            }
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            changes = {kind: _Changes() for kind in indexes}
+            for change in self._pending:
+                self._apply(indexes, changes, *change)
+            self._pending = None
+            self._indexes = indexes
+            self._changes = changes
+            self._snapshot = None
+            self._built_at = time.monotonic()
+
+    def _is_stale(self):
+        if self._indexes is None:
+            return True
+        if sum(len(changes.ids) for changes in self._changes.values()) > MAX_CHANGES:
+            return True
+        return bool(self.rebuild_seconds) and time.monotonic() - self._built_at > self.rebuild_seconds
+
+    def _ensure_built(self):
+        if not self._is_stale():
+            return
+        if self._indexes is None:
+            with self._build_lock:
+                if self._indexes is None:
+                    self._rebuild()
+            return
+        # Only one rebuild at a time; searches keep using the previous indexes meanwhile
+        if self._build_lock.acquire(blocking=False):
+            try:
+                thread = threading.Thread(target=self._rebuild_in_background,
+                                          args=(current_app._get_current_object(),),
+                                          name='autocomplete-rebuild', daemon=True)
+                thread.start()
+            except Exception:
+                self._build_lock.release()
+                raise
+
+    def _rebuild_in_background(self, app):
+        try:
+            with app.app_context():
+                if self._is_stale():
+                    self._rebuild()
+        except Exception:
+            app.logger.exception('Autocomplete rebuild failed')
+        finally:
+            self._build_lock.release()
+
+    @staticmethod
+    def _apply(indexes, all_changes, kind, item_id, name, score, payload):
+        changes = all_changes[kind]
+        existing = changes.index.get(item_id) if item_id in changes.ids else indexes[kind].get(item_id)
+        changes.ids.add(item_id)
+        if name is None:
+            changes.index.remove(item_id)
+            return
+        if score is None:
+            # Renamed products keep their ranking; new ones start unreviewed
+            if existing:
+                score, current = existing
+                payload = dict(current, **payload)
+            else:
+                score = (0, 0.0)
+                payload = dict({'rating_count': 0, 'average_rating': None}, **payload)
+        changes.index.put(item_id, name, score, payload)
+
+    def change(self, kind, item_id, name=None, score=None, payload=None):
+        with self._lock:
+            if self._indexes is not None:
+                self._apply(self._indexes, self._changes, kind, item_id, name, score, payload)
+                self._snapshot = None
+            if self._pending is not None:
+                self._pending.append((kind, item_id, name, score, payload))
+
+    def _get_snapshot(self):
+        # The change sets are copied once per burst of writes, not once per search
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = (self._indexes,
+                                      {kind: changes.copy() for kind, changes in self._changes.items()})
+                snapshot = self._snapshot
+        return snapshot
+
+    def search(self, prefix, k):
+        self._ensure_built()
+        prefix = normalize(prefix)
+        indexes, changes = self._get_snapshot()
+        results = {}
+        for kind, field in (('product', 'products'), ('manufacturer', 'manufacturers')):
+            found = (indexes[kind].search(prefix, k, changes[kind].ids)
+                     + changes[kind].index.search(prefix, k))
+            results[field] = [payload for _, payload in heapq.nlargest(k, found, key=lambda f: f[0])]
+        return results
+
+
+_autocomplete_lock = threading.Lock()
+
+
+def get_autocomplete(app=None):
+    app = app or current_app._get_current_object()
+    autocomplete = app.extensions.get('autocomplete')
+    if autocomplete is None:
+        with _autocomplete_lock:
+            autocomplete = app.extensions.get('autocomplete')
+            if autocomplete is None:
+                autocomplete = Autocomplete(app.config.get('AUTOCOMPLETE_REBUILD_SECONDS', 300),
+                                            app.config.get('AUTOCOMPLETE_MAX_LIMIT', 50))
+                app.extensions['autocomplete'] = autocomplete
+    return autocomplete
+
+
+# Call after a successful commit
+def product_saved(product_id, name):
+    get_autocomplete().change('product', product_id, name, payload={'product_id': product_id, 'name': name})
+
+
+def product_deleted(product_id):
+    get_autocomplete().change('product', product_id)
+
+
+def manufacturer_saved(manufacturer_id, name, rating):
+    get_autocomplete().change(
+        'manufacturer', manufacturer_id, name,
+        score=(float(rating) if rating is not None else 0.0,),
+        payload={'manufacturer_id': manufacturer_id, 'name': name, 'rating': rating},
+    )
+
+
+def manufacturer_deleted(manufacturer_id):
+    get_autocomplete().change('manufacturer', manufacturer_id)
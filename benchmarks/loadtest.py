@@ -0,0 +1,344 @@
+"""Mixed-traffic load test for every blueprint, reporting per-endpoint latency as JSON.
+
+Boots ``create_app()`` against the database configured in config.py (load
+ecommerce_db.sql or a generated dataset first) and drives it either in-process
+through the Flask test client or over HTTP through a local WSGI server:
+
+    python -m benchmarks.loadtest --scenario catalog --concurrency 8 --duration 30
+    python -m benchmarks.loadtest --scenario checkout --wsgi --output checkout.json
+
+Benchmark users are registered on start-up. ``--restock`` resets the stock of every
+product-manufacturer row first so checkout scenarios do not run dry.
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+import uuid
+
+from werkzeug.serving import make_server
+
+from app import create_app
+
+
+class TestClientTransport:
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        with self.app.test_client() as client:
+            response = client.open(path, method=method, json=body, headers=headers)
+            return response.status_code, response.get_json(silent=True)
+
+
+class WSGITransport:
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        try:
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            try:
+                payload = json.loads(data) if data else None
+            except ValueError:
+                payload = None
+            return response.status, payload
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, name, status, elapsed):
+        with self._lock:
+            entry = self.samples.setdefault(name, {'latencies': [], 'statuses': {}})
+            entry['latencies'].append(elapsed)
+            entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Session:
+    def __init__(self, transport, recorder, token, rng, catalog):
+        self.transport = transport
+        self.recorder = recorder
+        self.token = token
+        self.rng = rng
+        self.catalog = catalog
+        self.paid = set()
+
+    def call(self, name, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, payload = self.transport.request(method, path, body, self.token)
+        except Exception:
+            status, payload = 'error', None
+        self.recorder.record(name, status, time.perf_counter() - started)
+        return status, payload
+
+    def product_id(self):
+        return self.rng.choice(self.catalog['products'])
+
+    def pm_id(self):
+        return self.rng.choice(self.catalog['product_manufacturers'])
+
+    # Catalog browsing
+    def list_products(self):
+        self.call('GET /products', 'GET', '/products?limit=50')
+
+    def get_product(self):
+        self.call('GET /products/<id>', 'GET', f'/products/{self.product_id()}')
+
+    def product_rating(self):
+        self.call('GET /products/<id>/rating', 'GET', f'/products/{self.product_id()}/rating')
+
+    def products_with_manufacturers(self):
+        self.call('GET /products/products_with_manufacturers', 'GET', '/products/products_with_manufacturers?limit=50')
+
+    def top_rated(self):
+        self.call('GET /products/top_rated_products', 'GET', '/products/top_rated_products')
+
+    def list_manufacturers(self):
+        self.call('GET /manufacturers', 'GET', '/manufacturers')
+
+    def list_product_manufacturers(self):
+        self.call('GET /product_manufacturers', 'GET', '/product_manufacturers')
+
+    def product_reviews(self):
+        self.call('GET /reviews/product/<id>', 'GET', f'/reviews/product/{self.product_id()}?limit=20')
+
+    # Shopping
+    def add_to_cart(self):
+        self.call('POST /cart', 'POST', '/cart', {'product_manufacturer_id': self.pm_id(), 'quantity': 1})
+
+    def view_cart(self):
+        self.call('GET /cart', 'GET', '/cart')
+
+    def place_order(self):
+        self.call('POST /orders', 'POST', '/orders', {'product_manufacturer_id': self.pm_id(), 'order_quantity': 1})
+
+    def checkout(self):
+        self.add_to_cart()
+        self.call('POST /orders/checkout', 'POST', '/orders/checkout')
+
+    def pay(self):
+        status, orders = self.call('GET /orders', 'GET', '/orders')
+        if status != 200 or not orders:
+            return
+        unpaid = [order for order in orders if order['order_id'] not in self.paid]
+        if not unpaid:
+            return
+        order = max(unpaid, key=lambda o: o['order_id'])
+        self.paid.add(order['order_id'])
+        self.call('POST /payments', 'POST', '/payments',
+                  {'order_id': order['order_id'], 'amount_paid': 1.0, 'payment_method': 'Credit Card'})
+
+    def review(self):
+        self.call('POST /reviews', 'POST', '/reviews',
+                  {'product_id': self.product_id(), 'rating': self.rng.randint(1, 5), 'review_text': 'benchmark'})
+
+    # Admin reporting
+    def admin_orders(self):
+        self.call('GET /orders (admin)', 'GET', '/orders?limit=100')
+
+    def admin_payments(self):
+        self.call('GET /payments', 'GET', '/payments?limit=100')
+
+    def admin_shippings(self):
+        self.call('GET /shippings', 'GET', '/shippings?limit=100')
+
+    def admin_reviews(self):
+        self.call('GET /reviews', 'GET', '/reviews?limit=100')
+
+    def admin_users(self):
+        self.call('GET /users', 'GET', '/users?limit=100')
+
+    def admin_addresses(self):
+        self.call('GET /addresses/all', 'GET', '/addresses/all?limit=100')
+
+
+# Scenario -> (needs admin, [(action, weight)])
+SCENARIOS = {
+    'catalog': (False, [
+        ('list_products', 20), ('get_product', 25), ('product_rating', 10),
+        ('products_with_manufacturers', 15), ('top_rated', 10), ('list_manufacturers', 5),
+        ('list_product_manufacturers', 5), ('product_reviews', 10),
+    ]),
+    'checkout': (False, [
+        ('add_to_cart', 30), ('view_cart', 10), ('checkout', 25), ('place_order', 20), ('pay', 15),
+    ]),
+    'admin': (True, [
+        ('admin_orders', 20), ('admin_payments', 20), ('admin_shippings', 15),
+        ('admin_reviews', 20), ('admin_users', 15), ('admin_addresses', 10),
+    ]),
+    'mixed': (False, [
+        ('list_products', 15), ('get_product', 20), ('products_with_manufacturers', 10),
+        ('product_reviews', 10), ('top_rated', 5), ('add_to_cart', 12), ('view_cart', 5),
+        ('checkout', 8), ('place_order', 5), ('pay', 5), ('review', 5),
+    ]),
+}
+
+
+def register_user(transport, role='user'):
+    email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+    password = uuid.uuid4().hex
+    body = {'name': 'Benchmark User', 'email': email, 'password': password, 'role': role}
+    status, payload = transport.request('POST', '/auth/register', body)
+    if status != 201:
+        raise SystemExit(f'Could not register benchmark user: {status} {payload}')
+    status, payload = transport.request('POST', '/auth/login', {'email': email, 'password': password})
+    if status != 200:
+        raise SystemExit(f'Could not log in benchmark user: {status} {payload}')
+    return payload['token']
+
+
+def load_catalog(transport, token, restock):
+    _, products = transport.request('GET', '/products', token=token)
+    _, pms = transport.request('GET', '/product_manufacturers', token=token)
+    if not products or not pms:
+        raise SystemExit('The catalog is empty; seed the database first.')
+    if restock:
+        for pm in pms:
+            transport.request('PUT', f'/product_manufacturers/{pm["product_manufacturer_id"]}',
+                              {'stock': restock}, token=token)
+    return {
+        'products': [p['product_id'] for p in products],
+        'product_manufacturers': [pm['product_manufacturer_id'] for pm in pms],
+    }
+
+
+def run_worker(session, actions, weights, deadline, requests_left, lock):
+    while time.monotonic() < deadline:
+        if requests_left is not None:
+            with lock:
+                if requests_left[0] <= 0:
+                    return
+                requests_left[0] -= 1
+        getattr(session, session.rng.choices(actions, weights)[0])()
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    total = 0
+    for name, entry in sorted(recorder.samples.items()):
+        latencies = sorted(entry['latencies'])
+        total += len(latencies)
+        errors = sum(count for status, count in entry['statuses'].items()
+                     if status == 'error' or int(status) >= 500)
+        endpoints[name] = {
+            'count': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+            'statuses': entry['statuses'],
+            'error_rate': round(errors / len(latencies), 4),
+        }
+    return total, endpoints
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    parser.add_argument('--requests', type=int, help='stop after this many actions instead')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--wsgi', action='store_true', help='go over HTTP through a local WSGI server')
+    parser.add_argument('--restock', type=int, default=0, help='reset every stock level to this before starting')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['DEBUG'] = False
+    # Every benchmark client shares one address and a handful of users
+    app.config['RATELIMIT_ENABLED'] = False
+    transport = WSGITransport(app) if args.wsgi else TestClientTransport(app)
+
+    needs_admin, mix = SCENARIOS[args.scenario]
+    admin_token = register_user(transport, role='admin')
+    catalog = load_catalog(transport, admin_token, args.restock)
+
+    recorder = Recorder()
+    actions = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    sessions = [
+        Session(transport, recorder, admin_token if needs_admin else register_user(transport),
+                random.Random(args.seed + i), catalog)
+        for i in range(args.concurrency)
+    ]
+
+    lock = threading.Lock()
+    requests_left = [args.requests] if args.requests else None
+    deadline = time.monotonic() + (args.duration if not args.requests else float('inf'))
+    threads = [
+        threading.Thread(target=run_worker, args=(session, actions, weights, deadline, requests_left, lock))
+        for session in sessions
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if args.wsgi:
+        transport.close()
+
+    total, endpoints = summarize(recorder, elapsed)
+    report = {
+        'scenario': args.scenario,
+        'transport': 'wsgi' if args.wsgi else 'test_client',
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'revision': git_revision(),
+        'elapsed_s': round(elapsed, 3),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'endpoints': endpoints,
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Login burst against concurrent catalog reads, reporting both sides' latency as JSON.
+
+Boots ``create_app()`` against the database configured in config.py and runs two phases:
+catalog readers alone (the baseline), then the same readers while login threads hammer
+``/auth/login``. A healthy hashing pool keeps the catalog numbers of both phases close and
+turns excess logins into fast 503s instead of slow 200s:
+
+    python -m benchmarks.login_burst --login-threads 32 --reader-threads 8 --duration 20
+    python -m benchmarks.login_burst --hash-workers 0 --wsgi   # hash in request threads, for comparison
+
+Login users are registered on start-up (one per login thread).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+from app import create_app
+from benchmarks.loadtest import Recorder, TestClientTransport, WSGITransport, git_revision, summarize
+from passwords import get_password_hasher
+
+
+def register(transport, role='user'):
+    email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+    password = uuid.uuid4().hex
+    body = {'name': 'Benchmark User', 'email': email, 'password': password, 'role': role}
+    for _ in range(50):
+        status, payload = transport.request('POST', '/auth/register', body)
+        if status != 503:
+            break
+        time.sleep(0.1)
+    if status != 201:
+        raise SystemExit(f'Could not register benchmark user: {status} {payload}')
+    return {'email': email, 'password': password}
+
+
+def timed(recorder, name, transport, method, path, body=None, token=None):
+    started = time.perf_counter()
+    try:
+        status, _ = transport.request(method, path, body, token)
+    except Exception:
+        status = 'error'
+    recorder.record(name, status, time.perf_counter() - started)
+
+
+def reader(transport, recorder, token, product_ids, rng, deadline):
+    while time.monotonic() < deadline:
+        if rng.random() < 0.5:
+            timed(recorder, 'GET /products', transport, 'GET', '/products?limit=50', token=token)
+        else:
+            timed(recorder, 'GET /products/<id>', transport, 'GET', f'/products/{rng.choice(product_ids)}', token=token)
+
+
+def logger_in(transport, recorder, credentials, deadline):
+    while time.monotonic() < deadline:
+        timed(recorder, 'POST /auth/login', transport, 'POST', '/auth/login', credentials)
+
+
+def run_phase(transport, args, token, product_ids, login_users):
+    recorder = Recorder()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=reader, args=(transport, recorder, token, product_ids,
+                                              random.Random(args.seed + i), deadline))
+        for i in range(args.reader_threads)
+    ] + [
+        threading.Thread(target=logger_in, args=(transport, recorder, credentials, deadline))
+        for credentials in login_users
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total, endpoints = summarize(recorder, elapsed)
+    return {'elapsed_s': round(elapsed, 3), 'requests': total, 'endpoints': endpoints}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--login-threads', type=int, default=32)
+    parser.add_argument('--reader-threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per phase')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--hash-workers', type=int, help='override PASSWORD_HASH_WORKERS (0 = inline)')
+    parser.add_argument('--hash-max-pending', type=int, help='override PASSWORD_HASH_MAX_PENDING')
+    parser.add_argument('--wsgi', action='store_true', help='go over HTTP through a local WSGI server')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['DEBUG'] = False
+    # Every benchmark client shares one address and a handful of users
+    app.config['RATELIMIT_ENABLED'] = False
+    if args.hash_workers is not None:
+        app.config['PASSWORD_HASH_WORKERS'] = args.hash_workers
+    if args.hash_max_pending is not None:
+        app.config['PASSWORD_HASH_MAX_PENDING'] = args.hash_max_pending
+    transport = WSGITransport(app) if args.wsgi else TestClientTransport(app)
+
+    reader_user = register(transport)
+    _, payload = transport.request('POST', '/auth/login', reader_user)
+    token = payload['token']
+    _, products = transport.request('GET', '/products?limit=500', token=token)
+    if isinstance(products, dict):
+        products = products.get('items')
+    if not products:
+        raise SystemExit('The catalog is empty; seed the database first.')
+    product_ids = [p['product_id'] for p in products]
+    login_users = [register(transport) for _ in range(args.login_threads)]
+
+    baseline = run_phase(transport, args, token, product_ids, [])
+    burst = run_phase(transport, args, token, product_ids, login_users)
+
+    hasher = get_password_hasher(app)
+    report = {
+        'transport': 'wsgi' if args.wsgi else 'test_client',
+        'login_threads': args.login_threads,
+        'reader_threads': args.reader_threads,
+        'duration_s': args.duration,
+        'revision': git_revision(),
+        'hasher': hasher.stats(),
+        'baseline': baseline,
+        'burst': burst,
+    }
+
+    hasher.shutdown()
+    if args.wsgi:
+        transport.close()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Hammer a single SKU from many threads and report throughput and oversell.
+
+Run from the repository root against a database loaded from ecommerce_db.sql:
+
+    python -m benchmarks.stock_contention --threads 32 --stock 1000
+
+A throwaway Product/Manufacturer/ProductManufacturer row is created for the run
+and removed afterwards (together with its orders) unless --keep is given.
+``--mode legacy`` replays the old read-check-write logic of create_order for comparison.
+"""
+import argparse
+import json
+import threading
+import time
+
+import pymysql
+
+from config import Config
+
+
+def connect():
+    return pymysql.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD,
+        db=Config.MYSQL_DB,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def create_sku(stock):
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO Product (name, description) VALUES (%s, %s)',
+                       ('benchmark product', 'stock contention benchmark'))
+        product_id = cursor.lastrowid
+        cursor.execute('INSERT INTO Manufacturer (name) VALUES (%s)', ('benchmark manufacturer',))
+        manufacturer_id = cursor.lastrowid
+        cursor.execute(
+            'INSERT INTO ProductManufacturer (product_id, manufacturer_id, price, stock) VALUES (%s, %s, %s, %s)',
+            (product_id, manufacturer_id, 1.0, stock)
+        )
+        pm_id = cursor.lastrowid
+        conn.commit()
+        return product_id, manufacturer_id, pm_id
+    finally:
+        conn.close()
+
+
+def drop_sku(product_id, manufacturer_id, pm_id):
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM `Order` WHERE product_manufacturer_id = %s', (pm_id,))
+        cursor.execute('DELETE FROM ProductManufacturer WHERE product_manufacturer_id = %s', (pm_id,))
+        cursor.execute('DELETE FROM Manufacturer WHERE manufacturer_id = %s', (manufacturer_id,))
+        cursor.execute('DELETE FROM Product WHERE product_id = %s', (product_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def order_atomic(cursor, user_id, pm_id, quantity):
+    cursor.execute(
+        'UPDATE ProductManufacturer SET stock = stock - %s '
+        'WHERE product_manufacturer_id = %s AND stock >= %s',
+        (quantity, pm_id, quantity)
+    )
+    if cursor.rowcount == 0:
+        return False
+    cursor.execute(
+        'INSERT INTO `Order` (user_id, product_manufacturer_id, order_quantity) VALUES (%s, %s, %s)',
+        (user_id, pm_id, quantity)
+    )
+    return True
+
+
+def order_legacy(cursor, user_id, pm_id, quantity):
+    cursor.execute('SELECT price, stock FROM ProductManufacturer WHERE product_manufacturer_id = %s', (pm_id,))
+    stock = cursor.fetchone()['stock']
+    if stock < quantity:
+        return False
+    cursor.execute(
+        'INSERT INTO `Order` (user_id, product_manufacturer_id, order_quantity) VALUES (%s, %s, %s)',
+        (user_id, pm_id, quantity)
+    )
+    cursor.execute('UPDATE ProductManufacturer SET stock = %s WHERE product_manufacturer_id = %s',
+                   (stock - quantity, pm_id))
+    return True
+
+
+def worker(place_order, user_id, pm_id, quantity, attempts, start, results, lock):
+    conn = connect()
+    cursor = conn.cursor()
+    placed = rejected = errors = 0
+    start.wait()
+    try:
+        for _ in range(attempts):
+            try:
+                if place_order(cursor, user_id, pm_id, quantity):
+                    conn.commit()
+                    placed += 1
+                else:
+                    conn.rollback()
+                    rejected += 1
+            except pymysql.err.MySQLError:
+                conn.rollback()
+                errors += 1
+    finally:
+        conn.close()
+    with lock:
+        results['placed'] += placed
+        results['rejected'] += rejected
+        results['errors'] += errors
+
+
+def run(args):
+    product_id, manufacturer_id, pm_id = create_sku(args.stock)
+    place_order = order_atomic if args.mode == 'atomic' else order_legacy
+    results = {'placed': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    start = threading.Event()
+
+    threads = [
+        threading.Thread(target=worker, args=(place_order, args.user_id, pm_id, args.quantity,
+                                              args.attempts, start, results, lock))
+        for _ in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT stock FROM ProductManufacturer WHERE product_manufacturer_id = %s', (pm_id,))
+        final_stock = cursor.fetchone()['stock']
+        cursor.execute('SELECT COALESCE(SUM(order_quantity), 0) AS sold FROM `Order` WHERE product_manufacturer_id = %s',
+                       (pm_id,))
+        units_sold = int(cursor.fetchone()['sold'])
+    finally:
+        conn.close()
+
+    if not args.keep:
+        drop_sku(product_id, manufacturer_id, pm_id)
+
+    return {
+        'mode': args.mode,
+        'threads': args.threads,
+        'attempts': args.threads * args.attempts,
+        'quantity': args.quantity,
+        'initial_stock': args.stock,
+        'orders_placed': results['placed'],
+        'orders_rejected': results['rejected'],
+        'errors': results['errors'],
+        'elapsed_s': round(elapsed, 3),
+        'orders_per_s': round(results['placed'] / elapsed, 1) if elapsed else None,
+        'attempts_per_s': round(args.threads * args.attempts / elapsed, 1) if elapsed else None,
+        'units_sold': units_sold,
+        'final_stock': final_stock,
+        # Units sold beyond what was in stock, and stock lost to overwritten updates
+        'oversold_units': max(0, units_sold - args.stock),
+        'stock_drift': (args.stock - units_sold) - final_stock,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['atomic', 'legacy'], default='atomic')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=200, help='orders attempted per thread')
+    parser.add_argument('--stock', type=int, default=1000)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark SKU and its orders')
+    print(json.dumps(run(parser.parse_args()), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from flask import current_app, request
+
+from streaming import NDJSON_MIMETYPE
+
+CSV_MIMETYPE = 'text/csv'
+BULK_MIMETYPES = (CSV_MIMETYPE, NDJSON_MIMETYPE)
+
+
+class BulkReport:
+    # Counters plus a per-row error list capped at max_errors; failed keeps counting past the cap
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.counts = {}
+        self.errors = []
+        self.failed = 0
+
+    def add(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'error': message})
+
+    def to_dict(self):
+        return dict(self.counts, failed=self.failed, errors=self.errors,
+                    errors_truncated=self.failed > len(self.errors))
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+def _lines():
+    # Decode the request body incrementally; only one line is held at a time, and reading stops at a
+    # line longer than BULK_MAX_LINE_LENGTH so a body without newlines cannot fill memory
+    max_length = current_app.config.get('BULK_MAX_LINE_LENGTH', 1024 * 1024)
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = request.stream.read(64 * 1024)
+        pending += decoder.decode(chunk, final=not chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            if len(line) > max_length:
+                raise LineTooLong(max_length)
+            yield line + '\n'
+        if len(pending) > max_length:
+            raise LineTooLong(max_length)
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def _csv_records():
+    reader = csv.DictReader(_lines())
+    row_number = 0
+    try:
+        for record in reader:
+            row_number += 1
+            if None in record:
+                yield row_number, None, 'Too many columns'
+            else:
+                yield row_number, record, None
+    except LineTooLong as e:
+        yield row_number + 1, None, f'Line longer than {e} characters, import stopped here'
+    except (csv.Error, UnicodeDecodeError) as e:
+        # The reader cannot resynchronise after a malformed row, so the rest of the body is dropped
+        yield row_number + 1, None, f'Unreadable CSV, import stopped here: {e}'
+
+
+def _ndjson_records():
+    row_number = 0
+    try:
+        for line in _lines():
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(record, dict):
+                yield row_number, None, 'Each line must be a JSON object'
+                continue
+            yield row_number, record, None
+    except LineTooLong as e:
+        yield row_number + 1, None, f'Line longer than {e} characters, import stopped here'
+    except UnicodeDecodeError as e:
+        yield row_number + 1, None, f'Body is not UTF-8, import stopped here: {e}'
+
+
+def _json_records():
+    # A JSON array (or {"entries": [...]}) is parsed whole; use CSV or NDJSON for large batches
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('entries')
+    if not isinstance(data, list):
+        yield 1, None, 'Expected a JSON array of objects or {"entries": [...]}'
+        return
+    for row_number, record in enumerate(data, 1):
+        if isinstance(record, dict):
+            yield row_number, record, None
+        else:
+            yield row_number, None, 'Each entry must be a JSON object'
+
+
+def iter_records():
+    # (row_number, record, error) for each CSV row, NDJSON line or JSON array entry of the request body
+    if request.mimetype == CSV_MIMETYPE:
+        return _csv_records()
+    if request.is_json:
+        return _json_records()
+    return _ndjson_records()
+
+
+def is_bulk_request(allow_json=False):
+    return request.mimetype in BULK_MIMETYPES or (allow_json and request.is_json)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def optional_number(value, cast):
+    # CSV gives strings and NDJSON gives numbers; blanks mean "not provided". Raises ValueError.
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if cast is int and isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    return cast(value)
+
+
+def optional_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from db import get_db
+
+
+class QueryCache:
+    def __init__(self, max_entries=1024, ttl=60, max_tags=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_tags = max_tags
+        # key -> (expires_at, value, tags), least recently used first
+        self._entries = OrderedDict()
+        self._tags = {}
+        # Bumped by every invalidate(); each tag remembers the generation it was last invalidated at,
+        # so a value read before an invalidation can be refused when it is stored afterwards.
+        # At most max_tags are remembered, least recently invalidated first; a forgotten tag's
+        # generation is folded into _floor_generation, which refuses every read older than it
+        self._generation = 0
+        self._tag_generations = OrderedDict()
+        self._floor_generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, tags=(), generation=None):
+        # generation is what generation() returned before the value was read; if any of the tags has
+        # been invalidated since, the value may be stale and is not stored
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and (
+                    self._floor_generation > generation
+                    or any(self._tag_generations.get(tag, 0) > generation for tag in tags)):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._tag_generations[tag] = self._generation
+                self._tag_generations.move_to_end(tag)
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+            while len(self._tag_generations) > self.max_tags:
+                _, forgotten = self._tag_generations.popitem(last=False)
+                self._floor_generation = max(self._floor_generation, forgotten)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._floor_generation = self._generation
+            self._tag_generations.clear()
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'tracked_tags': len(self._tag_generations),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+_cache_lock = threading.Lock()
+
+
+def get_cache(app=None):
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('query_cache')
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get('query_cache')
+            if cache is None:
+                cache = QueryCache(
+                    max_entries=app.config.get('CATALOG_CACHE_MAX_ENTRIES', 1024),
+                    ttl=app.config.get('CATALOG_CACHE_TTL', 60),
+                    max_tags=app.config.get('CATALOG_CACHE_MAX_TAGS', 10000),
+                )
+                app.extensions['query_cache'] = cache
+    return cache
+
+
+def cached_query(query, params=(), tags=(), one=False):
+    # tags may be a callable so entries can be tagged with ids found in the result
+    enabled = current_app.config.get('CATALOG_CACHE_ENABLED', True)
+    key = (query, tuple(params), one)
+
+    if enabled:
+        cache = get_cache()
+        found, value = cache.get(key)
+        if found:
+            return value
+        # Taken before the read so an invalidate() racing with it keeps the result out of the cache
+        generation = cache.generation()
+
+    # Only a miss needs a pooled connection. It reads wherever get_db() routes the request, replicas
+    # included; a value a lagging replica returns right after a write lives at most one TTL.
+    cursor = get_db().cursor()
+    cursor.execute(query, params or None)
+    value = cursor.fetchone() if one else cursor.fetchall()
+
+    if enabled:
+        cache.set(key, value, tags(value) if callable(tags) else tags, generation)
+    return value
+
+
+def invalidate(*tags):
+    # Call after a successful commit
+    get_cache().invalidate(*tags)
@@ -4,4 +4,68 @@ class Config:
     MYSQL_HOST = 'localhost'
     MYSQL_USER = 'root'
     MYSQL_PASSWORD = ''  
-    MYSQL_DB = 'ecommerce_db'
\ No newline at end of file
+    MYSQL_DB = 'ecommerce_db'
+
+    # Connection pool
+    MYSQL_POOL_MIN_SIZE = 1
+    MYSQL_POOL_MAX_SIZE = 10
+    MYSQL_POOL_TIMEOUT = 5.0  # seconds to wait for a free connection
+    MYSQL_POOL_RECYCLE = 3600  # seconds before a connection is replaced
+    MYSQL_POOL_PRE_PING = True
+
+    # Read replicas, as host names or dicts overriding host/port/user/password/db.
+    # GET requests are routed to them round-robin; writes always go to the primary.
+    MYSQL_REPLICAS = []
+    MYSQL_REPLICA_STICKY_SECONDS = 5  # keep a client on the primary this long after a write
+
+    # Keyset pagination (?limit=&cursor=)
+    PAGE_DEFAULT_LIMIT = 50
+    PAGE_MAX_LIMIT = 500
+    ORDER_DETAIL_MAX_IDS = 100  # ids accepted by GET /orders/details
+
+    # Lower bounds of the price facet buckets on /products/products_with_manufacturers
+    PRODUCT_PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]
+
+    # Bulk endpoints: rows per transaction and per-row errors returned in the report
+    BULK_CHUNK_SIZE = 1000
+    BULK_MAX_ERRORS = 1000
+    BULK_MAX_LINE_LENGTH = 1024 * 1024  # characters per CSV/NDJSON line; longer ones stop the import
+    BULK_USER_MAX_ROWS = 200  # users per POST /users/bulk; each one is a password hash in the request
+
+    # Idempotency-Key replay store for order and payment creation
+    IDEMPOTENCY_TTL = 86400  # seconds a completed response is replayed
+    IDEMPOTENCY_MAX_ENTRIES = 10000
+    IDEMPOTENCY_WAIT_SECONDS = 10  # how long a duplicate waits for the in-flight original
+
+    # Password hashing, done in a process pool so bursts of logins don't starve request threads.
+    # Any werkzeug method string; stored hashes using another method are upgraded on login.
+    PASSWORD_HASH_METHOD = 'scrypt'  # e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = 2  # 0 hashes in the request thread
+    PASSWORD_HASH_MAX_PENDING = 16  # queued + running hashes before requests get 503
+    PASSWORD_HASH_TIMEOUT = 10.0  # seconds a request waits for its hash
+
+    # Access token revocation (logout, password change, admin demotion). Revoked jtis live in a
+    # Bloom filter so only its possible matches cost a RevokedToken lookup.
+    REVOCATION_BLOOM_CAPACITY = 100000  # revoked, unexpired tokens before the filter is resized
+    REVOCATION_BLOOM_ERROR_RATE = 0.001  # share of live tokens that need a lookup anyway
+    REVOCATION_REFRESH_SECONDS = 5  # how quickly other workers' revocations are picked up
+    REVOCATION_REBUILD_SECONDS = 3600  # full reload, dropping expired tokens
+
+    # Token-bucket rate limits declared on the auth and write routes (@rate_limit)
+    RATELIMIT_ENABLED = True
+    RATELIMIT_MAX_KEYS = 100000  # least recently seen clients are forgotten beyond this
+    RATELIMIT_BACKEND = 'ratelimit.memory_backend'  # import path of a factory taking the app
+
+    # In-process catalog cache (products, manufacturers, product-manufacturer rows)
+    CATALOG_CACHE_ENABLED = True
+    CATALOG_CACHE_TTL = 60  # seconds
+    CATALOG_CACHE_MAX_ENTRIES = 1024
+    CATALOG_CACHE_MAX_TAGS = 10000  # invalidated tags remembered to refuse racing reads
+
+    # In-memory name autocomplete for products and manufacturers
+    AUTOCOMPLETE_DEFAULT_LIMIT = 10
+    AUTOCOMPLETE_MAX_LIMIT = 50
+    AUTOCOMPLETE_REBUILD_SECONDS = 300  # full reload picks up other workers' changes
+
+    # Statements slower than this (ms) are written to the 'db.slow_query' logger as JSON
+    SLOW_QUERY_MS = 200
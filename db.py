@@ -1,20 +1,425 @@
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+
 import pymysql
-from flask import current_app, g
-from flask.cli import with_appcontext
+from flask import current_app, g, has_request_context, request
+from flask.cli import AppGroup, with_appcontext
+from flask_jwt_extended import get_jwt_identity
+
+
+db_cli = AppGroup('db', help='Database maintenance commands.')
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, creator, min_size=1, max_size=10, timeout=5.0, recycle=3600, pre_ping=True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+
+        self._creator = creator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        # Idle connections, most recently returned last
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._ping_failures = 0
+        self._wait_time = 0.0
+
+        for _ in range(min_size):
+            with self._lock:
+                self._size += 1
+            conn = self._create()
+            self._idle.append(conn)
+
+    def _create(self):
+        # The caller has already reserved the slot in _size; give it back if connecting fails
+        try:
+            conn = self._creator()
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    def _is_stale(self, conn):
+        created_at = self._created_at.get(id(conn), 0)
+        return self.recycle is not None and self.recycle > 0 and time.monotonic() - created_at > self.recycle
+
+    def _is_alive(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            conn = None
+            create = False
+            with self._available:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f'Timed out after {self.timeout}s waiting for a database connection '
+                            f'(pool size {self.max_size})'
+                        )
+                    self._available.wait(remaining)
+
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    # Reserve the slot under the same lock that checked it, so concurrent
+                    # callers cannot exceed max_size
+                    self._size += 1
+                    create = True
+
+            if create:
+                conn = self._create()
+            elif self._is_stale(conn):
+                self._recycled += 1
+                self._discard(conn)
+                continue
+            elif self.pre_ping and not self._is_alive(conn):
+                self._ping_failures += 1
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._checkouts += 1
+                self._wait_time += time.monotonic() - started
+            return conn
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                # Never hand an open transaction to the next request
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or self._is_stale(conn):
+            self._discard(conn)
+            return
+
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+
+    def close(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures,
+                'avg_wait_ms': round(self._wait_time * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+            }
+
+
+slow_query_logger = logging.getLogger('db.slow_query')
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+# Per-request statement records are capped; counters keep counting past the cap
+MAX_RECORDED_QUERIES = 500
+
+
+def fingerprint(query):
+    # Normalise a statement so that executions differing only in values group together
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = ' '.join(query.split())
+    query = query.replace('%s', '?')
+    query = _STRING_LITERAL.sub('?', query)
+    query = _NUMBER_LITERAL.sub('?', query)
+    return _VALUE_LIST.sub('(?+)', query)
+
+
+def _record_query(query, duration, rowcount):
+    g.db_query_count = g.get('db_query_count', 0) + 1
+    g.db_time = g.get('db_time', 0.0) + duration
+
+    record = None
+    queries = g.setdefault('db_queries', [])
+    if len(queries) < MAX_RECORDED_QUERIES:
+        record = {'fingerprint': fingerprint(query), 'duration_ms': round(duration * 1000, 3), 'rows': rowcount}
+        queries.append(record)
+
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold is not None and duration * 1000 >= threshold:
+        entry = dict(record or {'fingerprint': fingerprint(query), 'duration_ms': round(duration * 1000, 3),
+                                'rows': rowcount})
+        entry['pool'] = g.get('db_pool_name')
+        if has_request_context():
+            entry.update(method=request.method, path=request.path, endpoint=request.endpoint)
+        slow_query_logger.warning(json.dumps(entry, default=str))
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            _record_query(query, time.perf_counter() - started, self._cursor.rowcount)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            _record_query(query, time.perf_counter() - started, self._cursor.rowcount)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.raw.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def add_query_headers(response):
+    response.headers['X-DB-Query-Count'] = str(g.get('db_query_count', 0))
+    response.headers['X-DB-Time-Ms'] = f"{g.get('db_time', 0.0) * 1000:.3f}"
+    return response
+
+
+_pool_lock = threading.Lock()
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _connect(config, overrides=None):
+    overrides = overrides or {}
+    return pymysql.connect(
+        host=overrides.get('host', config['MYSQL_HOST']),
+        port=overrides.get('port', config.get('MYSQL_PORT', 3306)),
+        user=overrides.get('user', config['MYSQL_USER']),
+        password=overrides.get('password', config['MYSQL_PASSWORD']),
+        db=overrides.get('db', config['MYSQL_DB']),
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def _build_pool(config, overrides=None):
+    return ConnectionPool(
+        lambda: _connect(config, overrides),
+        min_size=config.get('MYSQL_POOL_MIN_SIZE', 1),
+        max_size=config.get('MYSQL_POOL_MAX_SIZE', 10),
+        timeout=config.get('MYSQL_POOL_TIMEOUT', 5.0),
+        recycle=config.get('MYSQL_POOL_RECYCLE', 3600),
+        pre_ping=config.get('MYSQL_POOL_PRE_PING', True),
+    )
+
+
+def _replica_overrides(config):
+    # Replicas may be given as bare host names or as dicts overriding any connection setting
+    replicas = []
+    for replica in config.get('MYSQL_REPLICAS') or []:
+        if isinstance(replica, str):
+            replica = {'host': replica}
+        replicas.append(dict(replica))
+    return replicas
+
+
+def get_pool(name='primary', app=None):
+    app = app or current_app._get_current_object()
+    pools = app.extensions.setdefault('db_pools', {})
+    pool = pools.get(name)
+    if pool is None:
+        with _pool_lock:
+            pool = pools.get(name)
+            if pool is None:
+                if name == 'primary':
+                    pool = _build_pool(app.config)
+                else:
+                    index = int(name.split(':', 1)[1])
+                    pool = _build_pool(app.config, _replica_overrides(app.config)[index])
+                pools[name] = pool
+    return pool
+
+
+def pool_stats(app=None):
+    app = app or current_app._get_current_object()
+    return {name: pool.stats() for name, pool in list(app.extensions.get('db_pools', {}).items())}
+
+
+class _Router:
+    def __init__(self, replica_count, sticky_seconds):
+        self.replica_count = replica_count
+        self.sticky_seconds = sticky_seconds
+        self._next = itertools.count()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def next_replica(self):
+        return f'replica:{next(self._next) % self.replica_count}'
+
+    def pin(self, key):
+        if not key or self.sticky_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pinned[key] = now + self.sticky_seconds
+            # Keep the table bounded by dropping expired pins once it grows
+            if len(self._pinned) > 10000:
+                self._pinned = {k: v for k, v in self._pinned.items() if v > now}
+
+    def is_pinned(self, key):
+        if not key:
+            return False
+        expires = self._pinned.get(key)
+        return expires is not None and expires > time.monotonic()
+
+
+def _get_router(app):
+    router = app.extensions.get('db_router')
+    if router is None:
+        with _pool_lock:
+            router = app.extensions.get('db_router')
+            if router is None:
+                router = _Router(
+                    len(_replica_overrides(app.config)),
+                    app.config.get('MYSQL_REPLICA_STICKY_SECONDS', 5),
+                )
+                app.extensions['db_router'] = router
+    return router
+
+
+def _client_key():
+    # Read-your-writes is tracked per JWT identity, falling back to the client address
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        identity = None
+    if identity is not None:
+        return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
+
+
+def _choose_pool():
+    app = current_app._get_current_object()
+    router = _get_router(app)
+    if not has_request_context():
+        return 'primary', None
+
+    key = _client_key()
+    if request.method not in READ_METHODS:
+        return 'primary', key
+    if router.replica_count == 0 or router.is_pinned(key):
+        return 'primary', None
+    return router.next_replica(), None
+
 
 def get_db():
     if 'db' not in g:
-        g.db = pymysql.connect(
-            host=current_app.config['MYSQL_HOST'],
-            user=current_app.config['MYSQL_USER'],
-            password=current_app.config['MYSQL_PASSWORD'],
-            db=current_app.config['MYSQL_DB'],
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        name, write_key = _choose_pool()
+        try:
+            conn = get_pool(name).acquire()
+        except Exception:
+            if name == 'primary':
+                raise
+            # An unavailable replica should never fail a read that the primary can serve
+            name = 'primary'
+            conn = get_pool(name).acquire()
+        g.db = InstrumentedConnection(conn)
+        g.db_pool_name = name
+        g.db_write_key = write_key
     return g.db
 
 def close_db(e=None):
     db = g.pop('db', None)
+    name = g.pop('db_pool_name', 'primary')
+    write_key = g.pop('db_write_key', None)
+    discard = g.pop('db_discard', False)
 
     if db is not None:
-        db.close()
\ No newline at end of file
+        if write_key is not None and e is None:
+            # Keep this client on the primary until the replicas have caught up
+            _get_router(current_app._get_current_object()).pin(write_key)
+
+        # A connection that raised mid-request may be in an unknown state
+        discard = discard or isinstance(e, pymysql.err.OperationalError)
+        get_pool(name).release(db.raw, discard=discard)
+
+
+ER_DUP_ENTRY = 1062
+_DUPLICATE_KEY = re.compile(r"for key '(?:[^'.]*\.)?([^']*)'")
+
+
+def duplicate_key(error):
+    # Name of the unique key an IntegrityError violated ('email', 'PRIMARY', ...), None if not a duplicate
+    if not isinstance(error, pymysql.err.IntegrityError) or not error.args or error.args[0] != ER_DUP_ENTRY:
+        return None
+    match = _DUPLICATE_KEY.search(str(error.args[1]) if len(error.args) > 1 else '')
+    return match.group(1) if match else ''
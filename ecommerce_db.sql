@@ -193,6 +193,35 @@ INSERT INTO `productmanufacturer` (`product_manufacturer_id`, `product_id`, `man
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `productratingstats`
+--
+
+DROP TABLE IF EXISTS `productratingstats`;
+CREATE TABLE IF NOT EXISTS `productratingstats` (
+  `product_id` int NOT NULL,
+  `rating_count` int NOT NULL DEFAULT '0',
+  `rating_sum` int NOT NULL DEFAULT '0',
+  `stars_0` int NOT NULL DEFAULT '0',
+  `stars_1` int NOT NULL DEFAULT '0',
+  `stars_2` int NOT NULL DEFAULT '0',
+  `stars_3` int NOT NULL DEFAULT '0',
+  `stars_4` int NOT NULL DEFAULT '0',
+  `stars_5` int NOT NULL DEFAULT '0',
+  `average_rating` decimal(5,4) GENERATED ALWAYS AS (if((`rating_count` > 0),(`rating_sum` / `rating_count`),NULL)) STORED,
+  PRIMARY KEY (`product_id`),
+  KEY `average_rating` (`average_rating`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+--
+-- Dumping data for table `productratingstats`
+--
+
+INSERT INTO `productratingstats` (`product_id`, `rating_count`, `rating_sum`, `stars_0`, `stars_1`, `stars_2`, `stars_3`, `stars_4`, `stars_5`) VALUES
+(1, 1, 5, 0, 0, 0, 0, 0, 1);
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `review`
 --
@@ -219,6 +248,23 @@ INSERT INTO `review` (`review_id`, `user_id`, `product_id`, `rating`, `review_te
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `revokedtoken`
+--
+
+DROP TABLE IF EXISTS `revokedtoken`;
+CREATE TABLE IF NOT EXISTS `revokedtoken` (
+  `jti` varchar(64) NOT NULL,
+  `user_id` int NOT NULL,
+  `expires_at` datetime DEFAULT NULL,
+  `revoked_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`jti`),
+  KEY `revoked_at` (`revoked_at`),
+  KEY `expires_at` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `shipping`
 --
@@ -271,6 +317,21 @@ INSERT INTO `user` (`user_id`, `name`, `email`, `phone_number`, `password`, `rol
 (3, 'John Johnson', 'John.johnson@example.com', '+1234567890', 'scrypt:32768:8:1$PYoUb7rGfvtzqI4q$5f29a033e58271692c7e4706ea80da6db65a7c0b32461cb8625884e4b788dc8adcc3070789f2bd08a2b23e0c76eefe34ae5724d5bea59657471e1d9c7728ee28', 'admin');
 COMMIT;
 
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `usertokenrevocation`
+--
+
+DROP TABLE IF EXISTS `usertokenrevocation`;
+CREATE TABLE IF NOT EXISTS `usertokenrevocation` (
+  `user_id` int NOT NULL,
+  `not_before` bigint UNSIGNED NOT NULL,
+  `revoked_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`user_id`),
+  KEY `revoked_at` (`revoked_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
 /*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;
 /*!40101 SET CHARACTER_SET_RESULTS=@OLD_CHARACTER_SET_RESULTS */;
 /*!40101 SET COLLATION_CONNECTION=@OLD_COLLATION_CONNECTION */;
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Response headers kept for replays
+STORED_HEADERS = ('Content-Type', 'Location')
+
+
+class _Entry:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+        self.expires_at = None
+
+
+class IdempotencyStore:
+    # (user, key) -> first request's response. Finished entries are kept least recently used first
+    # and capped at max_entries; entries still in flight live apart and are never evicted, so eviction
+    # only ever pops the oldest finished entry.
+    def __init__(self, max_entries=10000, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        self.replays = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    def begin(self, key, fingerprint):
+        # Returns ('owner', entry), ('replay', response), ('wait', entry) or ('conflict', None)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is None:
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at <= now:
+                    del self._entries[key]
+                    entry = None
+                elif entry is not None:
+                    self._entries.move_to_end(key)
+
+            if entry is None:
+                entry = self._in_flight[key] = _Entry(fingerprint)
+                return 'owner', entry
+
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                return 'conflict', None
+            if entry.response is not None:
+                self.replays += 1
+                return 'replay', entry.response
+            self.coalesced += 1
+            return 'wait', entry
+
+    def complete(self, key, entry, response):
+        with self._lock:
+            entry.response = response
+            entry.expires_at = time.monotonic() + self.ttl
+            if self._in_flight.get(key) is entry:
+                del self._in_flight[key]
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        entry.done.set()
+
+    def abandon(self, key, entry):
+        # The request failed; drop the key so the client's retry runs again
+        with self._lock:
+            if self._in_flight.get(key) is entry:
+                del self._in_flight[key]
+        entry.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries) + len(self._in_flight),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'replays': self.replays,
+                'coalesced': self.coalesced,
+                'conflicts': self.conflicts,
+            }
+
+
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store(app=None):
+    app = app or current_app._get_current_object()
+    store = app.extensions.get('idempotency_store')
+    if store is None:
+        with _store_lock:
+            store = app.extensions.get('idempotency_store')
+            if store is None:
+                store = IdempotencyStore(
+                    max_entries=app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000),
+                    ttl=app.config.get('IDEMPOTENCY_TTL', 86400),
+                )
+                app.extensions['idempotency_store'] = store
+    return store
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(stored):
+    body, status, headers = stored
+    response = Response(body, status=status, headers=headers)
+    response.headers[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    # Apply below @jwt_required(): keys are scoped to the caller's identity
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if idempotency_key is None:
+            return view(*args, **kwargs)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return jsonify({'message': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters'}), 400
+
+        store = get_idempotency_store()
+        key = (str(get_jwt_identity()), request.endpoint, idempotency_key)
+        fingerprint = _fingerprint()
+        wait_seconds = current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10)
+
+        while True:
+            state, value = store.begin(key, fingerprint)
+            if state == 'owner':
+                entry = value
+                break
+            if state == 'replay':
+                return _replay(value)
+            if state == 'conflict':
+                return jsonify({'message': f'{HEADER} was already used for a different request'}), 422
+            # Same request already running: wait for its outcome instead of running it twice
+            if not value.done.wait(wait_seconds):
+                return jsonify({'message': f'A request with this {HEADER} is still in progress'}), 409
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            store.abandon(key, entry)
+            raise
+
+        # Server errors are not remembered so that a retry gets another attempt
+        if response.status_code >= 500 or response.is_streamed:
+            store.abandon(key, entry)
+        else:
+            headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+            store.complete(key, entry, (response.get_data(), response.status_code, headers))
+        return response
+
+    return wrapper
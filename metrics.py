@@ -0,0 +1,242 @@
+import bisect
+import threading
+import time
+import weakref
+
+from flask import Response, g, request
+
+from cache import get_cache
+from db import pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shard:
+    # Written only by its owning thread; the lock is uncontended except while /metrics reads it
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.in_flight = 0
+
+
+class _ShardHolder:
+    # Lives only in its thread's threading.local, so it is collected when the thread exits
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        # Totals of threads that have exited, so thread-per-request servers do not pile up shards
+        self._retired = _Shard()
+        # Re-entrant in case a finalizer runs while the lock is held
+        self._shards_lock = threading.RLock()
+
+    def _shard(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = _ShardHolder(_Shard())
+            self._local.holder = holder
+            with self._shards_lock:
+                self._shards.append(holder.shard)
+            weakref.finalize(holder, self._retire, holder.shard)
+        return holder.shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            try:
+                self._shards.remove(shard)
+            except ValueError:
+                return
+            with shard.lock, self._retired.lock:
+                _merge(self._retired, shard)
+
+    def inc(self, name, labels, value=1):
+        shard = self._shard()
+        key = (name, labels)
+        with shard.lock:
+            shard.counters[key] = shard.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        shard = self._shard()
+        key = (name, labels)
+        with shard.lock:
+            histogram = shard.histograms.get(key)
+            if histogram is None:
+                # One slot per bucket plus +Inf, then sum
+                histogram = shard.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-1] += value
+
+    def add_in_flight(self, delta):
+        shard = self._shard()
+        with shard.lock:
+            shard.in_flight += delta
+
+    def collect(self):
+        total = _Shard()
+        # Held throughout so a shard cannot be retired, and counted twice, mid-scrape
+        with self._shards_lock:
+            for shard in [self._retired] + self._shards:
+                with shard.lock:
+                    _merge(total, shard)
+        return total.counters, total.histograms, total.in_flight
+
+
+def _merge(total, shard):
+    total.in_flight += shard.in_flight
+    for key, value in shard.counters.items():
+        total.counters[key] = total.counters.get(key, 0) + value
+    for key, values in shard.histograms.items():
+        merged = total.histograms.setdefault(key, [0] * len(values))
+        for i, value in enumerate(values):
+            merged[i] += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render(registry, app):
+    counters, histograms, in_flight = registry.collect()
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    header('http_request_duration_seconds', 'histogram', 'Request latency by blueprint, endpoint, method and status.')
+    for (name, labels), values in sorted(histograms.items()):
+        if name != 'http_request_duration_seconds':
+            continue
+        cumulative = 0
+        for bound, count in zip(list(registry.buckets) + ['+Inf'], values[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    header('http_requests_in_flight', 'gauge', 'Requests currently being handled.')
+    lines.append(f'http_requests_in_flight {in_flight}')
+
+    for metric, help_text in (
+        ('db_queries_total', 'SQL statements executed, by endpoint.'),
+        ('db_query_seconds_total', 'Time spent executing SQL statements, by endpoint.'),
+    ):
+        header(metric, 'counter', help_text)
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    pools = pool_stats(app)
+    for field, kind, help_text in (
+        ('size', 'gauge', 'Open connections in the pool.'),
+        ('idle', 'gauge', 'Idle connections in the pool.'),
+        ('in_use', 'gauge', 'Connections checked out of the pool.'),
+        ('max_size', 'gauge', 'Configured maximum pool size.'),
+        ('checkouts', 'counter', 'Connections handed out by the pool.'),
+        ('timeouts', 'counter', 'Checkouts that timed out waiting for a connection.'),
+    ):
+        metric = f'db_pool_{field}' + ('_total' if kind == 'counter' else '')
+        header(metric, kind, help_text)
+        for pool_name, stats in sorted(pools.items()):
+            lines.append(f'{metric}{_format_labels([("pool", pool_name)])} {stats[field]}')
+
+    cache = get_cache(app).stats()
+    header('cache_entries', 'gauge', 'Entries in the catalog cache.')
+    lines.append(f'cache_entries {cache["entries"]}')
+    for field in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        metric = f'cache_{field}_total'
+        header(metric, 'counter', f'Catalog cache {field}.')
+        lines.append(f'{metric} {cache[field]}')
+
+    # Only once something has hashed a password; rendering must not start the worker processes
+    hasher = app.extensions.get('password_hasher')
+    if hasher is not None:
+        hashing = hasher.stats()
+        header('password_hash_pending', 'gauge', 'Password hashes queued or running in the hashing pool.')
+        lines.append(f'password_hash_pending {hashing["pending"]}')
+        for field, help_text in (
+            ('completed', 'Password hashes and checks completed.'),
+            ('rejected', 'Password operations rejected with 503 because the pool was saturated.'),
+            ('rehashed', 'Stored hashes upgraded to PASSWORD_HASH_METHOD on login.'),
+        ):
+            metric = f'password_hash_{field}_total'
+            header(metric, 'counter', help_text)
+            lines.append(f'{metric} {hashing[field]}')
+
+    revocations = app.extensions.get('revocation_list')
+    if revocations is not None:
+        revocation = revocations.stats()
+        header('token_revocation_filter_bytes', 'gauge', 'Size of the revoked-token Bloom filter.')
+        lines.append(f'token_revocation_filter_bytes {revocation["filter_bytes"]}')
+        for field, help_text in (
+            ('checks', 'Access tokens checked against the revocation list.'),
+            ('lookups', 'Checks that hit the Bloom filter and needed a RevokedToken lookup.'),
+            ('false_positives', 'Lookups that found the token was not revoked after all.'),
+        ):
+            metric = f'token_revocation_{field}_total'
+            header(metric, 'counter', help_text)
+            lines.append(f'{metric} {revocation[field]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app):
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        registry.add_in_flight(1)
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            labels = (
+                ('blueprint', request.blueprint or ''),
+                ('endpoint', endpoint),
+                ('method', request.method),
+                ('status', str(response.status_code)),
+            )
+            registry.observe('http_request_duration_seconds', labels, time.perf_counter() - started)
+
+            query_count = g.get('db_query_count', 0)
+            if query_count:
+                registry.inc('db_queries_total', (('endpoint', endpoint),), query_count)
+                registry.inc('db_query_seconds_total', (('endpoint', endpoint),), g.get('db_time', 0.0))
+        return response
+
+    @app.teardown_request
+    def finish_request(e=None):
+        if g.pop('metrics_started', None) is not None:
+            registry.add_in_flight(-1)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(registry, app), content_type=CONTENT_TYPE)
+
+    return registry
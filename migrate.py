@@ -0,0 +1,214 @@
+import hashlib
+import os
+import re
+import sys
+from decimal import Decimal
+
+import click
+import pymysql
+
+from db import db_cli, get_db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+_MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+_STATEMENT_END = re.compile(r';\s*$', re.MULTILINE)
+
+# Errors that mean an index change is already in place, so re-running a partially applied
+# migration is safe: 1061 duplicate key name, 1091 can't drop a key that does not exist
+SKIPPABLE_ERRORS = {1061, 1091}
+
+def index_checks():
+    # (route, query, params, index_ordered) for each hot route, built from the SQL the route itself
+    # runs. index_ordered marks keyset-paginated queries whose ORDER BY must come from an index;
+    # a filesort there reads every matching row to serve one page. Search ranks by relevance and
+    # the rating sort orders by a joined aggregate, so those are allowed to sort.
+    from pagination import Page, page_query
+    from routes.address import ADDRESSES_QUERY
+    from routes.cart import CART_ITEM_QUERY, CART_ITEMS_QUERY
+    from routes.order import ORDER_KEYS, USER_ORDERS_QUERY, order_details_query
+    from routes.payment import PAYMENT_BY_ORDER_QUERY, PAYMENT_KEYS, PAYMENTS_QUERY
+    from routes.product import (OFFER_ID_KEYS, OFFER_SELECT, OFFER_SORTS, PRODUCTS_WITH_MANUFACTURERS_QUERY,
+                                SEARCH_KEYS, TOP_RATED_QUERY, name_lookup_query, offer_conditions,
+                                search_query)
+    from routes.review import REVIEW_KEYS, REVIEWS_QUERY, USER_REVIEW_QUERY, review_listing_query
+    from routes.shipping import SHIPPING_BY_ORDER_QUERY
+
+    def paged(select, keys, after, where=None, params=(), descending=False):
+        return page_query(select, keys, Page(50, after), where, params, descending)
+
+    def offers(sort, after, min_price=None, max_price=None, manufacturer_ids=(), min_rating=None, in_stock=False):
+        manufacturer_ids = list(manufacturer_ids)
+        shared, shared_params, price, price_params, manufacturer = offer_conditions(
+            min_price, max_price, manufacturer_ids, min_rating, in_stock
+        )
+        keys, descending = OFFER_SORTS[sort]
+        return paged(OFFER_SELECT, keys, after, shared + price + manufacturer,
+                     shared_params + price_params + manufacturer_ids, descending)
+
+    search_select, search_params = search_query('headphones', 10, 100, [])
+    return [
+        ('GET /cart', CART_ITEMS_QUERY, (1,), False),
+        ('POST /cart', CART_ITEM_QUERY, (1, 1), False),
+        ('GET /orders', USER_ORDERS_QUERY, (1,), False),
+        ('GET /orders?limit', *paged('SELECT * FROM `Order`', ORDER_KEYS, [100], ['user_id = %s'], (1,)), True),
+        ('GET /orders/details', *order_details_query([1, 2], 1), False),
+        ('GET /reviews/product/<id>?limit', *review_listing_query(1, page=Page(50, ['2024-01-01 00:00:00', 100])),
+         True),
+        ('GET /reviews/product/<id>?rating', *review_listing_query(1, 5, Page(50, ['2024-01-01 00:00:00', 100])),
+         True),
+        ('POST /reviews', USER_REVIEW_QUERY, (1, 1), False),
+        ('POST /shippings', SHIPPING_BY_ORDER_QUERY, (1,), False),
+        ('GET /reviews?limit',
+         *paged(REVIEWS_QUERY, REVIEW_KEYS, ['2024-01-01 00:00:00', 100], descending=True), True),
+        ('POST /payments', PAYMENT_BY_ORDER_QUERY, (1,), False),
+        ('GET /payments?limit',
+         *paged(PAYMENTS_QUERY, PAYMENT_KEYS, ['2024-01-01 00:00:00', 100], descending=True), True),
+        ('GET /addresses', ADDRESSES_QUERY, (1,), False),
+        ('GET /products/products_with_manufacturers?limit',
+         *paged(PRODUCTS_WITH_MANUFACTURERS_QUERY, OFFER_ID_KEYS, [100]), True),
+        ('GET /products/products_with_manufacturers?sort=price',
+         *offers('price', [Decimal('10.00'), 100], min_price=10, max_price=100), True),
+        ('GET /products/products_with_manufacturers?sort=price&manufacturer_id',
+         *offers('price_desc', [Decimal('100.00'), 100], max_price=100, manufacturer_ids=[1]), True),
+        ('GET /products/products_with_manufacturers?in_stock',
+         *offers('newest', [100], in_stock=True), True),
+        ('GET /products/products_with_manufacturers?sort=rating',
+         *offers('rating', [Decimal('4.0000'), 100], min_rating=4), False),
+        ('GET /products/search',
+         *paged(search_select, SEARCH_KEYS, None, params=search_params, descending=True), False),
+        ('POST /products/bulk', name_lookup_query('Product', 'product_id', 2), ('a', 'b'), False),
+        ('GET /products/top_rated_products', TOP_RATED_QUERY, (), False),
+    ]
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append({'version': int(match.group(1)), 'name': match.group(2), 'path': path, 'checksum': checksum})
+    return migrations
+
+
+def split_statements(sql):
+    # Statements end with ';' at the end of a line; '--' comment lines are dropped
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith('--')]
+    return [statement.strip() for statement in _STATEMENT_END.split('\n'.join(lines)) if statement.strip()]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version int NOT NULL,
+            name varchar(255) NOT NULL,
+            checksum char(64) NOT NULL,
+            applied_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version)
+        ) ENGINE=InnoDB
+    ''')
+
+
+def applied_migrations(cursor):
+    ensure_migrations_table(cursor)
+    cursor.execute('SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version')
+    return {row['version']: row for row in cursor.fetchall()}
+
+
+def apply_migration(db, migration, echo=print):
+    # MySQL commits DDL implicitly, so a migration is recorded only once every statement has run
+    cursor = db.cursor()
+    with open(migration['path']) as f:
+        statements = split_statements(f.read())
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except pymysql.err.MySQLError as e:
+            if e.args[0] not in SKIPPABLE_ERRORS:
+                db.rollback()
+                raise
+            echo(f'  skipped: {e.args[1]}')
+    cursor.execute(
+        'INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)',
+        (migration['version'], migration['name'], migration['checksum'])
+    )
+    db.commit()
+
+
+def upgrade(db, target=None, echo=print):
+    cursor = db.cursor()
+    applied = applied_migrations(cursor)
+    db.commit()
+    pending = [m for m in load_migrations()
+               if m['version'] not in applied and (target is None or m['version'] <= target)]
+    for migration in pending:
+        echo(f'Applying {migration["version"]:04d}_{migration["name"]}')
+        apply_migration(db, migration, echo)
+    return pending
+
+
+def explain_route_queries(cursor, checks=None):
+    results = []
+    for route, query, params, index_ordered in checks if checks is not None else index_checks():
+        cursor.execute('EXPLAIN ' + query, params or None)
+        for row in cursor.fetchall():
+            if row.get('table') is None:
+                continue
+            extra = row.get('Extra') or ''
+            filesort = 'Using filesort' in extra
+            results.append({
+                'route': route,
+                'table': row['table'],
+                'type': row['type'],
+                'key': row['key'],
+                'rows': row['rows'],
+                # <derived2>, <subquery3>: temporary tables of the statement itself, scanned by design
+                'full_scan': row['type'] == 'ALL' and not row['table'].startswith('<'),
+                'filesort': filesort,
+                'unindexed_sort': filesort and index_ordered,
+            })
+    return results
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, help='Stop after this migration version.')
+def upgrade_command(target):
+    """Apply pending schema migrations from migrations/."""
+    applied = upgrade(get_db(), target, echo=click.echo)
+    click.echo(f'Applied {len(applied)} migration(s).' if applied else 'Database is up to date.')
+
+
+@db_cli.command('status')
+def status_command():
+    """List schema migrations and whether they have been applied."""
+    applied = applied_migrations(get_db().cursor())
+    for migration in load_migrations():
+        row = applied.get(migration['version'])
+        if row is None:
+            state = 'pending'
+        elif row['checksum'] != migration['checksum']:
+            state = f'applied {row["applied_at"]} (file changed since)'
+        else:
+            state = f'applied {row["applied_at"]}'
+        click.echo(f'{migration["version"]:04d}_{migration["name"]}: {state}')
+
+
+@db_cli.command('check-indexes')
+def check_indexes_command():
+    """EXPLAIN each hot route query and fail on a whole-table scan or a filesort under a keyset page."""
+    results = explain_route_queries(get_db().cursor())
+    for result in results:
+        flags = []
+        if result['full_scan']:
+            flags.append('FULL SCAN')
+        if result['unindexed_sort']:
+            flags.append('FILESORT')
+        elif result['filesort']:
+            flags.append('filesort')
+        click.echo(f'{result["route"]:<45} {result["table"]:<22} type={result["type"]:<7} '
+                   f'key={result["key"] or "-":<28} rows={result["rows"]} {" ".join(flags)}'.rstrip())
+    if any(result['full_scan'] or result['unindexed_sort'] for result in results):
+        sys.exit(1)
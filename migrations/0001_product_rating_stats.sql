@@ -0,0 +1,23 @@
+-- Per-product review aggregates, for databases imported before the table was added to ecommerce_db.sql
+CREATE TABLE IF NOT EXISTS `productratingstats` (
+  `product_id` int NOT NULL,
+  `rating_count` int NOT NULL DEFAULT '0',
+  `rating_sum` int NOT NULL DEFAULT '0',
+  `stars_0` int NOT NULL DEFAULT '0',
+  `stars_1` int NOT NULL DEFAULT '0',
+  `stars_2` int NOT NULL DEFAULT '0',
+  `stars_3` int NOT NULL DEFAULT '0',
+  `stars_4` int NOT NULL DEFAULT '0',
+  `stars_5` int NOT NULL DEFAULT '0',
+  `average_rating` decimal(5,4) GENERATED ALWAYS AS (if((`rating_count` > 0),(`rating_sum` / `rating_count`),NULL)) STORED,
+  PRIMARY KEY (`product_id`),
+  KEY `average_rating` (`average_rating`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Fill in products that have reviews but no aggregate row yet; existing rows are left alone
+INSERT IGNORE INTO `productratingstats`
+  (`product_id`, `rating_count`, `rating_sum`, `stars_0`, `stars_1`, `stars_2`, `stars_3`, `stars_4`, `stars_5`)
+SELECT `product_id`, COUNT(*), SUM(`rating`),
+       SUM(`rating` = 0), SUM(`rating` = 1), SUM(`rating` = 2), SUM(`rating` = 3), SUM(`rating` = 4), SUM(`rating` = 5)
+FROM `review`
+GROUP BY `product_id`;
@@ -0,0 +1,6 @@
+-- address, shipping and user were dumped as MyISAM: table-level locks and no transactions.
+-- Converting from MyISAM copies the table, so it cannot run with LOCK=NONE; writes to
+-- the table block for the duration of the copy.
+ALTER TABLE `address` ENGINE=InnoDB;
+ALTER TABLE `shipping` ENGINE=InnoDB;
+ALTER TABLE `user` ENGINE=InnoDB;
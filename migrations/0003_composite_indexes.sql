@@ -0,0 +1,46 @@
+-- Composite and unique indexes for the filters the routes actually run.
+-- One index change per statement so a partially applied migration can be re-run
+-- (duplicate key names and already-dropped keys are skipped by the runner).
+
+-- Cart: one row per (user, product_manufacturer). Merge duplicates into the oldest row first.
+UPDATE `cart` c
+JOIN (
+  SELECT MIN(`cart_id`) AS `keep_id`, SUM(`quantity`) AS `total`
+  FROM `cart`
+  GROUP BY `user_id`, `product_manufacturer_id`
+  HAVING COUNT(*) > 1
+) d ON c.`cart_id` = d.`keep_id`
+SET c.`quantity` = d.`total`;
+
+DELETE c FROM `cart` c
+JOIN `cart` k ON k.`user_id` = c.`user_id`
+  AND k.`product_manufacturer_id` = c.`product_manufacturer_id`
+  AND k.`cart_id` < c.`cart_id`;
+
+ALTER TABLE `cart` ADD UNIQUE KEY `user_product_manufacturer` (`user_id`, `product_manufacturer_id`), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `cart` DROP KEY `user_id`, ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Review: one review per (user, product), keeping the most recent one
+DELETE r FROM `review` r
+JOIN `review` k ON k.`user_id` = r.`user_id`
+  AND k.`product_id` = r.`product_id`
+  AND k.`review_id` > r.`review_id`;
+
+-- Recompute the aggregates in case duplicates were removed above
+DELETE FROM `productratingstats`;
+INSERT INTO `productratingstats`
+  (`product_id`, `rating_count`, `rating_sum`, `stars_0`, `stars_1`, `stars_2`, `stars_3`, `stars_4`, `stars_5`)
+SELECT `product_id`, COUNT(*), SUM(`rating`),
+       SUM(`rating` = 0), SUM(`rating` = 1), SUM(`rating` = 2), SUM(`rating` = 3), SUM(`rating` = 4), SUM(`rating` = 5)
+FROM `review`
+GROUP BY `product_id`;
+
+ALTER TABLE `review` ADD UNIQUE KEY `user_product` (`user_id`, `product_id`), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `review` DROP KEY `user_id`, ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Reviews of a product, newest first
+ALTER TABLE `review` ADD KEY `product_date` (`product_id`, `review_date`), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `review` DROP KEY `product_id`, ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Shipping lookups by order (present in newer dumps, skipped there)
+ALTER TABLE `shipping` ADD KEY `order_id` (`order_id`), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,3 @@
+-- Full-text index behind GET /products/search. The first FULLTEXT index on a table adds the
+-- hidden FTS_DOC_ID column, which rebuilds the table and cannot allow concurrent writes.
+ALTER TABLE `product` ADD FULLTEXT KEY `name_description` (`name`, `description`), ALGORITHM=INPLACE, LOCK=SHARED;
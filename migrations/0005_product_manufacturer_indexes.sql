@@ -0,0 +1,14 @@
+-- Indexes for the faceted listing and search filters on ProductManufacturer.
+-- The listing filters and pages on the exact two-decimal price, CAST(price AS DECIMAL(10,2)),
+-- because FLOAT equality breaks the keyset tie-break, so the price keys are functional keys on
+-- that expression. InnoDB appends the primary key to every secondary index, so price_exact also
+-- serves the (price, product_manufacturer_id) keyset sort.
+ALTER TABLE `productmanufacturer` ADD KEY `price_exact` ((CAST(`price` AS DECIMAL(10,2)))), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Manufacturer filter with a price range or price sort; replaces the single-column key
+ALTER TABLE `productmanufacturer` ADD KEY `manufacturer_price_exact` (`manufacturer_id`, (CAST(`price` AS DECIMAL(10,2)))), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `productmanufacturer` DROP KEY `manufacturer_id`, ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Per-product offer lookups with a price range (search EXISTS, joins); replaces the single-column key
+ALTER TABLE `productmanufacturer` ADD KEY `product_price` (`product_id`, `price`), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `productmanufacturer` DROP KEY `product_id`, ALGORITHM=INPLACE, LOCK=NONE;
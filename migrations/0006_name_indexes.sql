@@ -0,0 +1,3 @@
+-- Bulk catalog import matches products and manufacturers by name
+ALTER TABLE `product` ADD KEY `name` (`name`), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `manufacturer` ADD KEY `name` (`name`), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,18 @@
+-- Revoked access tokens (logout) and per-user revocations (password change, role demotion)
+CREATE TABLE IF NOT EXISTS `revokedtoken` (
+  `jti` varchar(64) NOT NULL,
+  `user_id` int NOT NULL,
+  `expires_at` datetime DEFAULT NULL,
+  `revoked_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`jti`),
+  KEY `revoked_at` (`revoked_at`),
+  KEY `expires_at` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `usertokenrevocation` (
+  `user_id` int NOT NULL,
+  `not_before` int UNSIGNED NOT NULL,
+  `revoked_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`user_id`),
+  KEY `revoked_at` (`revoked_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
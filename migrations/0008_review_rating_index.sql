@@ -0,0 +1,4 @@
+-- Per-product review listing filtered by star rating, newest first. InnoDB appends review_id,
+-- so the index also serves the (review_date, review_id) keyset sort; product_date keeps
+-- serving the unfiltered listing.
+ALTER TABLE `review` ADD KEY `product_rating_date` (`product_id`, `rating`, `review_date`), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,5 @@
+-- Per-user revocation cut-offs move from whole seconds to milliseconds, compared against the iat_ms
+-- claim issued at login, so a token from earlier in the same second as a password change is refused.
+-- The WHERE keeps a re-run from scaling already converted rows again.
+ALTER TABLE `usertokenrevocation` MODIFY `not_before` bigint UNSIGNED NOT NULL;
+UPDATE `usertokenrevocation` SET `not_before` = `not_before` * 1000 WHERE `not_before` < 100000000000;
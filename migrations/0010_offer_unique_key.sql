@@ -0,0 +1,7 @@
+-- One offer per (product, manufacturer), so a concurrent or retried bulk import updates the offer
+-- instead of inserting a second one. Existing duplicates are not merged here: carts and orders
+-- point at specific offers, so an operator has to decide which one stays. Until then this fails
+-- with a duplicate-entry error; find them with
+--   SELECT product_id, manufacturer_id, COUNT(*) FROM productmanufacturer
+--   GROUP BY product_id, manufacturer_id HAVING COUNT(*) > 1;
+ALTER TABLE `productmanufacturer` ADD UNIQUE KEY `product_manufacturer` (`product_id`, `manufacturer_id`), ALGORITHM=INPLACE, LOCK=NONE;
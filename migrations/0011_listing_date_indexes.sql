@@ -0,0 +1,5 @@
+-- The admin payment and review listings page newest first on (payment_date, payment_id) and
+-- (review_date, review_id). InnoDB appends the primary key to a secondary index, so a key on the
+-- date alone serves each keyset order without a filesort.
+ALTER TABLE `payment` ADD KEY `payment_date` (`payment_date`), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE `review` ADD KEY `review_date` (`review_date`), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,112 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import abort, current_app, jsonify, make_response, request
+
+
+class Page:
+    def __init__(self, limit, after=None):
+        self.limit = limit
+        self.after = after
+
+
+def _bad_request(message):
+    abort(make_response(jsonify({'message': message}), 400))
+
+
+def _cursor_value(value):
+    # MySQL compares these string forms correctly against DATETIME/DECIMAL columns
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_cursor_value(v) for v in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        _bad_request('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        _bad_request('Invalid cursor')
+    return values
+
+
+def get_page(key_count=1):
+    # Paging is opt-in so existing clients keep receiving the full list
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return None
+
+    limit = request.args.get('limit', current_app.config.get('PAGE_DEFAULT_LIMIT', 50))
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        _bad_request('limit must be an integer')
+    if limit < 1:
+        _bad_request('limit must be greater than 0')
+    limit = min(limit, current_app.config.get('PAGE_MAX_LIMIT', 500))
+
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor, key_count) if cursor else None
+    return Page(limit, after)
+
+
+def keyset_condition(columns, values, descending=False):
+    # Expanded form of (a, b) > (x, y), which MySQL can turn into an index range scan
+    op = '<' if descending else '>'
+    clauses = []
+    params = []
+    for i, column in enumerate(columns):
+        parts = [f'{c} = %s' for c in columns[:i]] + [f'{column} {op} %s']
+        clauses.append('(' + ' AND '.join(parts) + ')')
+        params.extend(values[:i])
+        params.append(values[i])
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def page_query(select, keys, page, where=None, params=(), descending=False):
+    # keys is a list of (sql_column, result_field) pairs forming a unique sort key
+    conditions = list(where or [])
+    params = list(params)
+
+    if page.after is not None:
+        condition, condition_params = keyset_condition([c for c, _ in keys], page.after, descending)
+        conditions.append(condition)
+        params.extend(condition_params)
+
+    query = select
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    direction = 'DESC' if descending else 'ASC'
+    query += ' ORDER BY ' + ', '.join(f'{c} {direction}' for c, _ in keys)
+    query += ' LIMIT %s'
+    params.append(page.limit + 1)
+    return query, params
+
+
+def fetch_page(cursor, select, keys, page, where=None, params=(), descending=False):
+    query, params = page_query(select, keys, page, where, params, descending)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor([rows[-1][field] for _, field in keys])
+    return rows, next_cursor
+
+
+def page_response(rows, next_cursor):
+    return jsonify({'items': rows, 'next_cursor': next_cursor}), 200
@@ -0,0 +1,175 @@
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    # Runs werkzeug's hashing in worker processes so a login burst costs pool slots, not request
+    # threads' CPU. At most max_pending hashes are queued or running; beyond that callers get
+    # HasherBusy right away instead of waiting behind the queue. workers=0 hashes inline.
+    def __init__(self, method='scrypt', workers=2, max_pending=16, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._method_prefix = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: forking a threaded server can copy locks held by other threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _submit(self, fn, *args):
+        # Needs a slot from _reserve(); the slot is given back when the future finishes
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            result = fn(*args)
+            with self._lock:
+                self.completed += 1
+            return result
+
+        if not self._reserve():
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The hash still finishes in the pool and keeps its slot until then
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords, max_in_flight=None):
+        # For bulk jobs. Keeps at most max_in_flight hashes (default: one per worker) in the pool, so
+        # a login arriving meanwhile queues behind a few bulk hashes rather than the whole batch, and
+        # waits for a slot instead of failing when the pool is saturated.
+        if not self.workers:
+            return [self._run(generate_password_hash, password, self.method) for password in passwords]
+
+        limit = max_in_flight or self.workers
+        results = [None] * len(passwords)
+        in_flight = deque()
+        for i, password in enumerate(passwords):
+            while len(in_flight) >= limit or not self._reserve():
+                if in_flight:
+                    j, future = in_flight.popleft()
+                    results[j] = future.result()
+                else:
+                    time.sleep(0.05)
+            in_flight.append((i, self._submit(generate_password_hash, password, self.method)))
+        for j, future in in_flight:
+            results[j] = future.result()
+        return results
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # Stored hashes look like 'scrypt:32768:8:1$salt$hash'; werkzeug fills in defaults for a
+        # short method such as 'scrypt', so the canonical prefix is taken from a real hash once.
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+    def record_rehash(self, n=1):
+        with self._lock:
+            self.rehashed += n
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher(app=None):
+    app = app or current_app._get_current_object()
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        with _hasher_lock:
+            hasher = app.extensions.get('password_hasher')
+            if hasher is None:
+                hasher = PasswordHasher(
+                    method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+                    workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+                    max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 16),
+                    timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10.0),
+                )
+                app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    return get_password_hasher().verify(pwhash, password)
+
+
+def busy_response():
+    return jsonify({'message': 'Too many password operations in progress, try again shortly.'}), 503, {'Retry-After': '1'}
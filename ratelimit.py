@@ -0,0 +1,101 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from werkzeug.utils import import_string
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    # '10/minute' -> (10, 60)
+    count, _, period = limit.partition('/')
+    if period not in PERIODS or not count.strip().isdigit() or int(count) < 1:
+        raise ValueError(f'Invalid rate limit {limit!r}; expected e.g. "10/minute"')
+    return int(count), PERIODS[period]
+
+
+class MemoryBackend:
+    # key -> (tokens, last refill). Least recently used first: when max_keys is exceeded the
+    # oldest key is dropped, which only ever hands that client a full bucket again.
+    # A shared backend (e.g. Redis) only needs the same take() method.
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period, cost=1):
+        # Returns (allowed, seconds until cost tokens are available)
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def memory_backend(app):
+    return MemoryBackend(app.config.get('RATELIMIT_MAX_KEYS', 100000))
+
+
+_backend_lock = threading.Lock()
+
+
+def get_rate_limit_backend(app=None):
+    app = app or current_app._get_current_object()
+    backend = app.extensions.get('rate_limit_backend')
+    if backend is None:
+        with _backend_lock:
+            backend = app.extensions.get('rate_limit_backend')
+            if backend is None:
+                factory = app.config.get('RATELIMIT_BACKEND', 'ratelimit.memory_backend')
+                backend = import_string(factory)(app) if isinstance(factory, str) else factory(app)
+                app.extensions['rate_limit_backend'] = backend
+    return backend
+
+
+def _client_key(by):
+    if by == 'user':
+        # Needs @jwt_required() above the limiter
+        return f'user:{get_jwt_identity()}'
+    # Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so this is the client's address
+    return f'ip:{request.remote_addr}'
+
+
+def rate_limit(limit, by='ip', scope=None):
+    # Token bucket allowing bursts of up to N requests and N per period on average, e.g.
+    # @rate_limit('10/minute'). Stack one per key type; each gets its own budget.
+    capacity, period = parse_limit(limit)
+    if by not in ('ip', 'user'):
+        raise ValueError(f'Unknown rate limit key {by!r}')
+
+    def decorator(view):
+        bucket_scope = scope or f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RATELIMIT_ENABLED', True):
+                return view(*args, **kwargs)
+            key = f'{bucket_scope}:{_client_key(by)}'
+            allowed, retry_after = get_rate_limit_backend().take(key, capacity, period)
+            if not allowed:
+                return jsonify({'message': 'Too many requests, slow down.'}), 429, \
+                    {'Retry-After': str(max(1, math.ceil(retry_after)))}
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
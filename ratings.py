@@ -0,0 +1,86 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import click
+from db import db_cli, get_db
+
+STAR_COLUMNS = ['stars_0', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5']
+
+
+def stored_rating(rating):
+    # Review.rating is an INT column; round the same way MySQL does when storing the value
+    return int(Decimal(str(rating)).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def apply_rating_change(cursor, product_id, old_rating=None, new_rating=None):
+    # Adjust the aggregate row for a review being created, re-rated or deleted.
+    # Must run in the same transaction as the Review change itself.
+    if old_rating == new_rating:
+        return
+
+    count_delta = 0
+    sum_delta = 0
+    stars = [0] * len(STAR_COLUMNS)
+
+    if old_rating is not None:
+        count_delta -= 1
+        sum_delta -= old_rating
+        stars[old_rating] -= 1
+    if new_rating is not None:
+        count_delta += 1
+        sum_delta += new_rating
+        stars[new_rating] += 1
+
+    columns = ['rating_count', 'rating_sum'] + STAR_COLUMNS
+    cursor.execute(
+        'INSERT INTO ProductRatingStats (product_id, ' + ', '.join(columns) + ') '
+        'VALUES (%s, ' + ', '.join(['%s'] * len(columns)) + ') '
+        'ON DUPLICATE KEY UPDATE ' + ', '.join(f'{c} = {c} + VALUES({c})' for c in columns),
+        (product_id, count_delta, sum_delta, *stars)
+    )
+
+
+def get_rating_stats(cursor, product_id):
+    cursor.execute('SELECT * FROM ProductRatingStats WHERE product_id = %s', (product_id,))
+    stats = cursor.fetchone()
+    if not stats:
+        return None
+    return {
+        'product_id': stats['product_id'],
+        'rating_count': stats['rating_count'],
+        'average_rating': stats['average_rating'],
+        'histogram': {str(star): stats[column] for star, column in enumerate(STAR_COLUMNS)},
+    }
+
+
+def empty_rating_stats(product_id):
+    return {
+        'product_id': product_id,
+        'rating_count': 0,
+        'average_rating': None,
+        'histogram': {str(star): 0 for star in range(len(STAR_COLUMNS))},
+    }
+
+
+def rebuild_rating_stats(cursor):
+    cursor.execute('DELETE FROM ProductRatingStats')
+    cursor.execute(
+        'INSERT INTO ProductRatingStats (product_id, rating_count, rating_sum, ' + ', '.join(STAR_COLUMNS) + ') '
+        'SELECT product_id, COUNT(*), SUM(rating), '
+        + ', '.join(f'SUM(rating = {star})' for star in range(len(STAR_COLUMNS))) +
+        ' FROM Review GROUP BY product_id'
+    )
+    return cursor.rowcount
+
+
+@db_cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    """Recompute ProductRatingStats from the Review table."""
+    db = get_db()
+    cursor = db.cursor()
+    try:
+        count = rebuild_rating_stats(cursor)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    click.echo(f'Rebuilt rating aggregates for {count} products.')
@@ -0,0 +1,289 @@
+import hashlib
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import click
+import pymysql
+from flask import current_app
+
+from db import db_cli, get_db, get_pool
+
+REFRESH_OVERLAP = timedelta(seconds=60)  # re-read before the last sync on each incremental refresh
+ISSUED_AT_CLAIM = 'iat_ms'  # issue time in milliseconds; iat alone is whole seconds
+
+
+class BloomFilter:
+    # No false negatives; about error_rate false positives while holding up to capacity items
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    # Answers "is this token revoked?" without a query for almost every request: per-user revocations
+    # are held exactly (one int per affected user), revoked jtis in a Bloom filter whose possible
+    # matches are confirmed against RevokedToken. Other workers' revocations are picked up by an
+    # incremental refresh every refresh_seconds; a full rebuild every rebuild_seconds drops expired
+    # tokens and resizes the filter.
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_seconds=5, rebuild_seconds=3600):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._filter = None
+        self._not_before = {}
+        self._synced_at = None
+        self._refreshed_at = 0.0
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Revocations made while a rebuild is reading the tables, replayed onto the new filter
+        self._pending = None
+
+        self.checks = 0
+        self.lookups = 0
+        self.false_positives = 0
+
+    def _rebuild(self, cursor):
+        with self._lock:
+            self._pending = []
+        try:
+            cursor.execute('SELECT NOW() AS now')
+            synced_at = cursor.fetchone()['now']
+            cursor.execute('SELECT jti FROM RevokedToken WHERE expires_at IS NULL OR expires_at > NOW()')
+            rows = cursor.fetchall()
+            bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+            for row in rows:
+                bloom.add(row['jti'])
+            cursor.execute('SELECT user_id, not_before FROM UserTokenRevocation')
+            not_before = {row['user_id']: row['not_before'] for row in cursor.fetchall()}
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for kind, key, value in self._pending:
+                self._apply(bloom, not_before, kind, key, value)
+            self._pending = None
+            self._filter = bloom
+            self._not_before = not_before
+            self._synced_at = synced_at
+            self._built_at = self._refreshed_at = time.monotonic()
+
+    def _refresh(self, cursor):
+        # Rows are re-read from a little before the last sync so a transaction that committed late
+        # is not missed; adding a jti twice is harmless
+        cursor.execute('SELECT NOW() AS now')
+        synced_at = cursor.fetchone()['now']
+        since = self._synced_at - REFRESH_OVERLAP
+        cursor.execute('SELECT jti FROM RevokedToken WHERE revoked_at >= %s', (since,))
+        jtis = [row['jti'] for row in cursor.fetchall()]
+        cursor.execute('SELECT user_id, not_before FROM UserTokenRevocation WHERE revoked_at >= %s', (since,))
+        users = cursor.fetchall()
+        with self._lock:
+            for jti in jtis:
+                self._apply(self._filter, self._not_before, 'token', jti, None)
+            for row in users:
+                self._apply(self._filter, self._not_before, 'user', row['user_id'], row['not_before'])
+            self._synced_at = synced_at
+            self._refreshed_at = time.monotonic()
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._refreshed_at < self.refresh_seconds:
+            return
+        # Only one thread refreshes; the others keep answering from the current state
+        if not self._refresh_lock.acquire(blocking=self._filter is None):
+            return
+        try:
+            now = time.monotonic()
+            if (self._filter is None or now - self._built_at > self.rebuild_seconds
+                    or self._filter.count > self._filter.capacity):
+                with _primary_cursor() as cursor:
+                    self._rebuild(cursor)
+            elif now - self._refreshed_at >= self.refresh_seconds:
+                with _primary_cursor() as cursor:
+                    self._refresh(cursor)
+        finally:
+            self._refresh_lock.release()
+
+    @staticmethod
+    def _apply(bloom, not_before, kind, key, value):
+        if kind == 'token':
+            bloom.add(key)
+        else:
+            not_before[key] = max(value, not_before.get(key, 0))
+
+    def change(self, kind, key, value=None):
+        with self._lock:
+            if self._filter is not None:
+                self._apply(self._filter, self._not_before, kind, key, value)
+            if self._pending is not None:
+                self._pending.append((kind, key, value))
+
+    def is_revoked(self, payload):
+        self._sync()
+        with self._lock:
+            self.checks += 1
+            user_id = _user_id(payload)
+            if user_id is not None and _issued_at_ms(payload) < self._not_before.get(user_id, 0):
+                return True
+            if payload['jti'] not in self._filter:
+                return False
+            self.lookups += 1
+
+        with _primary_cursor() as cursor:
+            cursor.execute('SELECT 1 FROM RevokedToken WHERE jti = %s', (payload['jti'],))
+            revoked = cursor.fetchone() is not None
+        if revoked:
+            return True
+        with self._lock:
+            self.false_positives += 1
+        return False
+
+    def revoke_token(self, cursor, payload):
+        # Commit afterwards, then call token_revoked() with the same payload
+        cursor.execute(
+            'INSERT IGNORE INTO RevokedToken (jti, user_id, expires_at) VALUES (%s, %s, FROM_UNIXTIME(%s))',
+            (payload['jti'], _user_id(payload), payload.get('exp'))
+        )
+
+    def revoke_user(self, cursor, user_id):
+        # Every token of the user issued before this millisecond; returns the cut-off for user_revoked()
+        not_before = time.time_ns() // 1000000
+        cursor.execute(
+            'INSERT INTO UserTokenRevocation (user_id, not_before) VALUES (%s, %s) '
+            'ON DUPLICATE KEY UPDATE not_before = GREATEST(not_before, VALUES(not_before))',
+            (user_id, not_before)
+        )
+        return not_before
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revoked_tokens': self._filter.count if self._filter is not None else None,
+                'revoked_users': len(self._not_before),
+                'filter_bytes': len(self._filter._bits) if self._filter is not None else 0,
+                'checks': self.checks,
+                'lookups': self.lookups,
+                'false_positives': self.false_positives,
+            }
+
+
+@contextmanager
+def _primary_cursor():
+    # The blocklist loader runs before the JWT identity is known, so get_db() would route by client
+    # address: reads could hit a lagging replica and writes would pin the wrong client. Revocation
+    # state is always read from the primary on a connection of its own.
+    pool = get_pool('primary')
+    conn = pool.acquire()
+    discard = False
+    try:
+        yield conn.cursor()
+    except pymysql.err.OperationalError:
+        discard = True
+        raise
+    finally:
+        pool.release(conn, discard=discard)
+
+
+def issued_at_claims():
+    # Merge into additional_claims when creating an access token
+    return {ISSUED_AT_CLAIM: time.time_ns() // 1000000}
+
+
+def _issued_at_ms(payload):
+    # Tokens without the claim count from the start of their iat second, so a same-second cut-off
+    # refuses them rather than letting them through
+    issued_at = payload.get(ISSUED_AT_CLAIM)
+    if isinstance(issued_at, int) and not isinstance(issued_at, bool):
+        return issued_at
+    return payload.get('iat', 0) * 1000
+
+
+def _user_id(payload):
+    try:
+        return int(payload.get('sub'))
+    except (TypeError, ValueError):
+        return None
+
+
+_revocation_lock = threading.Lock()
+
+
+def get_revocation_list(app=None):
+    app = app or current_app._get_current_object()
+    revocations = app.extensions.get('revocation_list')
+    if revocations is None:
+        with _revocation_lock:
+            revocations = app.extensions.get('revocation_list')
+            if revocations is None:
+                revocations = RevocationList(
+                    capacity=app.config.get('REVOCATION_BLOOM_CAPACITY', 100000),
+                    error_rate=app.config.get('REVOCATION_BLOOM_ERROR_RATE', 0.001),
+                    refresh_seconds=app.config.get('REVOCATION_REFRESH_SECONDS', 5),
+                    rebuild_seconds=app.config.get('REVOCATION_REBUILD_SECONDS', 3600),
+                )
+                app.extensions['revocation_list'] = revocations
+    return revocations
+
+
+# Registered with @jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    return get_revocation_list().is_revoked(jwt_payload)
+
+
+# Write with revoke_*() inside the caller's transaction, then report after a successful commit
+def revoke_token(cursor, payload):
+    get_revocation_list().revoke_token(cursor, payload)
+
+
+def token_revoked(payload):
+    get_revocation_list().change('token', payload['jti'])
+
+
+def revoke_user(cursor, user_id):
+    return get_revocation_list().revoke_user(cursor, user_id)
+
+
+def user_revoked(user_id, not_before):
+    get_revocation_list().change('user', user_id, not_before)
+
+
+@db_cli.command('purge-revoked-tokens')
+def purge_revoked_tokens_command():
+    """Delete revocation rows that no longer matter because the tokens they cover have expired."""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM RevokedToken WHERE expires_at < NOW()')
+    tokens = cursor.rowcount
+    users = 0
+    expires = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+    if expires:
+        seconds = expires.total_seconds() if hasattr(expires, 'total_seconds') else expires
+        # not_before is in milliseconds
+        cutoff = time.time_ns() // 1000000 - int(seconds * 1000)
+        cursor.execute('DELETE FROM UserTokenRevocation WHERE not_before < %s', (cutoff,))
+        users = cursor.rowcount
+    db.commit()
+    click.echo(f'Purged {tokens} revoked token(s) and {users} user revocation(s).')
@@ -1,12 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from pagination import fetch_page, get_page, page_response
+from streaming import stream_query, wants_ndjson
 import os
 from flasgger import swag_from
 
 address_bp = Blueprint('address', __name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+ADDRESSES_QUERY = '''
+    SELECT address_id, country, city, zip_code, address_line
+    FROM Address
+    WHERE user_id = %s
+'''
+
 # Create a new address
 @address_bp.route('', methods=['POST'])
 @jwt_required()
@@ -47,11 +55,7 @@ def get_addresses():
     cursor = db.cursor()
 
     try:
-        cursor.execute('''
-            SELECT address_id, country, city, zip_code, address_line
-            FROM Address
-            WHERE user_id = %s
-        ''', (current_user_id,))
+        cursor.execute(ADDRESSES_QUERY, (current_user_id,))
         addresses = cursor.fetchall()
         return jsonify(addresses), 200
     except Exception as e:
@@ -161,23 +165,33 @@ def get_all_addresses():
     if role != 'admin':
         return jsonify({'message': 'Admins only!'}), 403
 
+    query = '''
+        SELECT
+            a.address_id,
+            a.user_id,
+            u.name AS user_name,
+            a.country,
+            a.city,
+            a.zip_code,
+            a.address_line
+        FROM
+            Address a
+        INNER JOIN
+            User u ON a.user_id = u.user_id
+    '''
+
     db = get_db()
     cursor = db.cursor()
     try:
-        cursor.execute('''
-            SELECT
-                a.address_id,
-                a.user_id,
-                u.name AS user_name,
-                a.country,
-                a.city,
-                a.zip_code,
-                a.address_line
-            FROM
-                Address a
-            INNER JOIN
-                User u ON a.user_id = u.user_id
-        ''')
+        page = get_page()
+        if page:
+            rows, next_cursor = fetch_page(cursor, query, [('a.address_id', 'address_id')], page)
+            return page_response(rows, next_cursor)
+
+        if wants_ndjson():
+            return stream_query(query)
+
+        cursor.execute(query)
         addresses = cursor.fetchall()
         return jsonify(addresses), 200
     except Exception as e:
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from db import get_db
+from ratelimit import rate_limit
 import os
 from flasgger import swag_from
 
@@ -8,6 +9,28 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 
 cart_bp = Blueprint('cart', __name__)
 
+CART_ITEMS_QUERY = """
+    SELECT
+        c.cart_id,
+        c.product_manufacturer_id,
+        c.quantity,
+        pm.price,
+        pm.stock,
+        p.name AS product_name,
+        m.name AS manufacturer_name
+    FROM
+        Cart c
+    INNER JOIN
+        ProductManufacturer pm ON c.product_manufacturer_id = pm.product_manufacturer_id
+    INNER JOIN
+        Product p ON pm.product_id = p.product_id
+    INNER JOIN
+        Manufacturer m ON pm.manufacturer_id = m.manufacturer_id
+    WHERE
+        c.user_id = %s
+"""
+CART_ITEM_QUERY = 'SELECT cart_id, quantity FROM Cart WHERE user_id = %s AND product_manufacturer_id = %s'
+
 # Get all items in the user's cart
 @cart_bp.route('', methods=['GET'])
 @jwt_required()
@@ -17,26 +40,7 @@ def get_cart_items():
     db = get_db()
     cursor = db.cursor()
     
-    cursor.execute("""
-        SELECT
-            c.cart_id,
-            c.product_manufacturer_id,
-            c.quantity,
-            pm.price,
-            pm.stock,
-            p.name AS product_name,
-            m.name AS manufacturer_name
-        FROM
-            Cart c
-        INNER JOIN
-            ProductManufacturer pm ON c.product_manufacturer_id = pm.product_manufacturer_id
-        INNER JOIN
-            Product p ON pm.product_id = p.product_id
-        INNER JOIN
-            Manufacturer m ON pm.manufacturer_id = m.manufacturer_id
-        WHERE
-            c.user_id = %s
-    """, (current_user_id,))
+    cursor.execute(CART_ITEMS_QUERY, (current_user_id,))
     
     cart_items = cursor.fetchall()
     return jsonify(cart_items), 200
@@ -44,6 +48,7 @@ def get_cart_items():
 # Add an item to the cart
 @cart_bp.route('', methods=['POST'])
 @jwt_required()
+@rate_limit('60/minute', by='user')
 @swag_from(os.path.join(current_dir, 'docs', 'cart','add_to_cart.yml'))
 def add_to_cart():
     current_user_id = get_jwt_identity()
@@ -72,8 +77,7 @@ def add_to_cart():
             return jsonify({'message': 'Requested quantity exceeds available stock'}), 400
 
         # Check if the item is already in the cart
-        cursor.execute('SELECT cart_id, quantity FROM Cart WHERE user_id = %s AND product_manufacturer_id = %s', 
-                       (current_user_id, product_manufacturer_id))
+        cursor.execute(CART_ITEM_QUERY, (current_user_id, product_manufacturer_id))
         existing_cart_item = cursor.fetchone()
         
         if existing_cart_item:
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from cache import cached_query, invalidate
+from autocomplete import manufacturer_deleted, manufacturer_saved
 import os
 from flasgger import swag_from
 
@@ -12,10 +14,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'manufacturer' ,'get_manufacturers.yml'))
 def get_manufacturers():
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM Manufacturer')
-    manufacturers = cursor.fetchall()
+    manufacturers = cached_query('SELECT * FROM Manufacturer', tags=['manufacturer'])
     return jsonify(manufacturers), 200
 
 # Get a specific manufacturer
@@ -23,10 +22,10 @@ def get_manufacturers():
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'manufacturer' ,'get_manufacturer.yml'))
 def get_manufacturer(manufacturer_id):
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM Manufacturer WHERE manufacturer_id = %s', (manufacturer_id,))
-    manufacturer = cursor.fetchone()
+    manufacturer = cached_query(
+        'SELECT * FROM Manufacturer WHERE manufacturer_id = %s', (manufacturer_id,),
+        tags=[f'manufacturer:{manufacturer_id}'], one=True
+    )
     if not manufacturer:
         return jsonify({'message': 'Manufacturer not found'}), 404
     return jsonify(manufacturer), 200
@@ -62,6 +61,8 @@ def create_manufacturer():
             VALUES (%s, %s)
         ''', (name, rating))
         db.commit()
+        invalidate('manufacturer', f'manufacturer:{cursor.lastrowid}')
+        manufacturer_saved(cursor.lastrowid, name, rating)
         return jsonify({'message': 'Manufacturer created successfully'}), 201
 
     except Exception as e:
@@ -117,6 +118,12 @@ def update_manufacturer(manufacturer_id):
 
         cursor.execute(query, tuple(values))
         db.commit()
+        invalidate('manufacturer', f'manufacturer:{manufacturer_id}')
+        manufacturer_saved(
+            manufacturer_id,
+            name if name is not None else manufacturer['name'],
+            rating if rating is not None else manufacturer['rating']
+        )
         return jsonify({'message': 'Manufacturer updated successfully'}), 200
 
     except Exception as e:
@@ -154,6 +161,8 @@ def delete_manufacturer(manufacturer_id):
         # Delete the manufacturer
         cursor.execute('DELETE FROM Manufacturer WHERE manufacturer_id = %s', (manufacturer_id,))
         db.commit()
+        invalidate('manufacturer', f'manufacturer:{manufacturer_id}')
+        manufacturer_deleted(manufacturer_id)
         return jsonify({'message': 'Manufacturer deleted successfully'}), 200
 
     except Exception as e:
@@ -1,12 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from idempotency import idempotent
+from ratelimit import rate_limit
+from cache import invalidate
+from pagination import fetch_page, get_page, page_response
+from streaming import stream_query, wants_ndjson
 import os
 from flasgger import swag_from
 
 order_bp = Blueprint('order', __name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+ORDER_KEYS = [('order_id', 'order_id')]
+USER_ORDERS_QUERY = 'SELECT * FROM `Order` WHERE user_id = %s'
+
 # Get all orders (Admins can view all, users can view their own)
 @order_bp.route('', methods=['GET'])
 @jwt_required()
@@ -19,11 +27,20 @@ def get_orders():
     db = get_db()
     cursor = db.cursor()
 
+    page = get_page()
+    if page:
+        where = None if role == 'admin' else ['user_id = %s']
+        params = () if role == 'admin' else (current_user_id,)
+        rows, next_cursor = fetch_page(cursor, 'SELECT * FROM `Order`', ORDER_KEYS, page, where, params)
+        return page_response(rows, next_cursor)
+
     if role == 'admin':
+        if wants_ndjson():
+            return stream_query('SELECT * FROM `Order`')
         cursor.execute('SELECT * FROM `Order`')
         orders = cursor.fetchall()
     else:
-        cursor.execute('SELECT * FROM `Order` WHERE user_id = %s', (current_user_id,))
+        cursor.execute(USER_ORDERS_QUERY, (current_user_id,))
         orders = cursor.fetchall()
 
     return jsonify(orders), 200
@@ -51,9 +68,145 @@ def get_order(order_id):
 
     return jsonify(order), 200
 
+ORDER_DETAIL_QUERY = '''
+    SELECT
+        o.order_id, o.user_id, o.order_date, o.order_quantity, o.status,
+        pm.product_manufacturer_id, pm.price,
+        p.product_id, p.name AS product_name, p.description AS product_description,
+        m.manufacturer_id, m.name AS manufacturer_name,
+        pay.payment_id, pay.payment_date, pay.amount_paid, pay.payment_method,
+        s.shipping_id, s.shipping_date, s.estimated_delivery, s.status AS shipping_status,
+        a.address_id, a.country, a.city, a.zip_code, a.address_line
+    FROM
+        `Order` o
+    LEFT JOIN
+        ProductManufacturer pm ON pm.product_manufacturer_id = o.product_manufacturer_id
+    LEFT JOIN
+        Product p ON p.product_id = pm.product_id
+    LEFT JOIN
+        Manufacturer m ON m.manufacturer_id = pm.manufacturer_id
+    LEFT JOIN
+        Payment pay ON pay.order_id = o.order_id
+    LEFT JOIN
+        Shipping s ON s.order_id = o.order_id
+    LEFT JOIN
+        Address a ON a.address_id = s.address_id
+'''
+
+def order_details_query(order_ids, user_id=None):
+    # user_id restricts the result to that user's orders
+    query = ORDER_DETAIL_QUERY + ' WHERE o.order_id IN (' + ', '.join(['%s'] * len(order_ids)) + ')'
+    params = list(order_ids)
+    if user_id is not None:
+        query += ' AND o.user_id = %s'
+        params.append(user_id)
+    query += ' ORDER BY o.order_id DESC, pay.payment_id, s.shipping_id'
+    return query, params
+
+def fetch_order_details(cursor, order_ids, user_id=None):
+    # One round trip for any number of orders
+    cursor.execute(*order_details_query(order_ids, user_id))
+
+    details = {}
+    for row in cursor.fetchall():
+        # An order has at most one payment and one shipment; keep the first if data says otherwise
+        if row['order_id'] in details:
+            continue
+        details[row['order_id']] = {
+            'order_id': row['order_id'],
+            'user_id': row['user_id'],
+            'order_date': row['order_date'],
+            'order_quantity': row['order_quantity'],
+            'status': row['status'],
+            'total_price': row['price'] * row['order_quantity'] if row['price'] is not None else None,
+            'product_manufacturer_id': row['product_manufacturer_id'],
+            'price': row['price'],
+            'product': {
+                'product_id': row['product_id'],
+                'name': row['product_name'],
+                'description': row['product_description'],
+            } if row['product_id'] is not None else None,
+            'manufacturer': {
+                'manufacturer_id': row['manufacturer_id'],
+                'name': row['manufacturer_name'],
+            } if row['manufacturer_id'] is not None else None,
+            'payment': {
+                'payment_id': row['payment_id'],
+                'payment_date': row['payment_date'],
+                'amount_paid': row['amount_paid'],
+                'payment_method': row['payment_method'],
+            } if row['payment_id'] is not None else None,
+            'shipping': {
+                'shipping_id': row['shipping_id'],
+                'shipping_date': row['shipping_date'],
+                'estimated_delivery': row['estimated_delivery'],
+                'status': row['shipping_status'],
+                'address': {
+                    'address_id': row['address_id'],
+                    'country': row['country'],
+                    'city': row['city'],
+                    'zip_code': row['zip_code'],
+                    'address_line': row['address_line'],
+                } if row['address_id'] is not None else None,
+            } if row['shipping_id'] is not None else None,
+        }
+    return details
+
+# Get an order with its product, manufacturer, payment, shipping and address
+@order_bp.route('/<int:order_id>/detail', methods=['GET'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'order' ,'get_order_detail.yml'))
+def get_order_detail(order_id):
+    current_user_id = get_jwt_identity()
+    claims = get_jwt()
+    role = claims.get('role', 'user')
+
+    cursor = get_db().cursor()
+    detail = fetch_order_details(cursor, [order_id]).get(order_id)
+
+    if not detail:
+        return jsonify({'message': 'Order not found'}), 404
+
+    if role != 'admin' and detail['user_id'] != int(current_user_id):
+        return jsonify({'message': 'Access denied'}), 403
+
+    return jsonify(detail), 200
+
+# Get details for many orders at once (order history pages)
+@order_bp.route('/details', methods=['GET'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'order' ,'get_order_details.yml'))
+def get_order_details():
+    current_user_id = get_jwt_identity()
+    claims = get_jwt()
+    role = claims.get('role', 'user')
+
+    try:
+        order_ids = [int(order_id) for value in request.args.getlist('ids')
+                     for order_id in value.split(',') if order_id.strip()]
+    except ValueError:
+        return jsonify({'message': 'ids must be a comma-separated list of integers'}), 400
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        return jsonify({'message': 'ids is required'}), 400
+    max_ids = current_app.config.get('ORDER_DETAIL_MAX_IDS', 100)
+    if len(order_ids) > max_ids:
+        return jsonify({'message': f'At most {max_ids} ids per request'}), 400
+
+    # Other users' orders are simply not returned, so they are indistinguishable from missing ones
+    user_id = None if role == 'admin' else int(current_user_id)
+    details = fetch_order_details(get_db().cursor(), order_ids, user_id)
+
+    return jsonify({
+        'orders': [details[order_id] for order_id in order_ids if order_id in details],
+        'missing': [order_id for order_id in order_ids if order_id not in details],
+    }), 200
+
 # Create a new order
 @order_bp.route('', methods=['POST'])
 @jwt_required()
+@rate_limit('30/minute', by='user')
+@idempotent
 @swag_from(os.path.join(current_dir, 'docs', 'order' ,'create_order.yml'))
 def create_order():
     current_user_id = get_jwt_identity()
@@ -71,17 +224,20 @@ def create_order():
     cursor = db.cursor()
 
     try:
-        # Fetch price and stock information
-        cursor.execute('SELECT price, stock FROM ProductManufacturer WHERE product_manufacturer_id = %s', (product_manufacturer_id,))
-        product_manufacturer = cursor.fetchone()
-
-        if not product_manufacturer:
-            return jsonify({'message': 'ProductManufacturer not found'}), 404
-
-        price = product_manufacturer['price']
-        stock = product_manufacturer['stock']
+        # Reserve stock with a single guarded decrement; the row count decides success,
+        # so concurrent checkouts can neither oversell nor overwrite each other's stock
+        cursor.execute(
+            'UPDATE ProductManufacturer SET stock = stock - %s '
+            'WHERE product_manufacturer_id = %s AND stock >= %s',
+            (order_quantity, product_manufacturer_id, order_quantity)
+        )
 
-        if stock < order_quantity:
+        if cursor.rowcount == 0:
+            db.rollback()
+            cursor.execute('SELECT product_manufacturer_id FROM ProductManufacturer WHERE product_manufacturer_id = %s',
+                           (product_manufacturer_id,))
+            if not cursor.fetchone():
+                return jsonify({'message': 'ProductManufacturer not found'}), 404
             return jsonify({'message': 'Not enough stock available'}), 400
 
         # Create the order
@@ -90,12 +246,8 @@ def create_order():
             (current_user_id, product_manufacturer_id, order_quantity)
         )
 
-        # Update stock
-        new_stock = stock - order_quantity
-        cursor.execute('UPDATE ProductManufacturer SET stock = %s WHERE product_manufacturer_id = %s',
-                       (new_stock, product_manufacturer_id))
-
         db.commit()
+        invalidate('product_manufacturer', f'product_manufacturer:{product_manufacturer_id}')
 
         return jsonify({'message': 'Order created successfully'}), 201
 
@@ -104,6 +256,94 @@ def create_order():
         return jsonify({'error': str(e)}), 500
 
 
+# Turn the user's cart into orders in a single transaction
+@order_bp.route('/checkout', methods=['POST'])
+@jwt_required()
+@rate_limit('10/minute', by='user')
+@idempotent
+@swag_from(os.path.join(current_dir, 'docs', 'order' ,'checkout.yml'))
+def checkout():
+    current_user_id = int(get_jwt_identity())
+
+    db = get_db()
+    cursor = db.cursor()
+
+    try:
+        # Lock the user's cart lines so they cannot change underneath the checkout
+        cursor.execute('SELECT cart_id, product_manufacturer_id, quantity FROM Cart WHERE user_id = %s FOR UPDATE',
+                       (current_user_id,))
+        cart_items = cursor.fetchall()
+
+        if not cart_items:
+            db.rollback()
+            return jsonify({'message': 'Cart is empty'}), 400
+
+        quantities = {}
+        for item in cart_items:
+            pm_id = item['product_manufacturer_id']
+            quantities[pm_id] = quantities.get(pm_id, 0) + item['quantity']
+        pm_ids = sorted(quantities)
+        placeholders = ', '.join(['%s'] * len(pm_ids))
+
+        # Lock stock rows in primary key order; every checkout uses the same order, so
+        # concurrent checkouts sharing products cannot deadlock each other
+        cursor.execute(
+            'SELECT product_manufacturer_id, price, stock FROM ProductManufacturer '
+            'WHERE product_manufacturer_id IN (' + placeholders + ') '
+            'ORDER BY product_manufacturer_id FOR UPDATE',
+            pm_ids
+        )
+        stock_rows = {row['product_manufacturer_id']: row for row in cursor.fetchall()}
+
+        missing = [pm_id for pm_id in pm_ids if pm_id not in stock_rows]
+        if missing:
+            db.rollback()
+            return jsonify({'message': 'ProductManufacturer not found', 'product_manufacturer_ids': missing}), 404
+
+        insufficient = [
+            {'product_manufacturer_id': pm_id, 'requested': quantities[pm_id], 'available': stock_rows[pm_id]['stock']}
+            for pm_id in pm_ids if stock_rows[pm_id]['stock'] < quantities[pm_id]
+        ]
+        if insufficient:
+            db.rollback()
+            return jsonify({'message': 'Not enough stock available', 'items': insufficient}), 400
+
+        # Decrement every line's stock in one statement
+        cursor.execute(
+            'UPDATE ProductManufacturer SET stock = stock - CASE product_manufacturer_id '
+            + ' '.join(['WHEN %s THEN %s'] * len(pm_ids)) +
+            ' END WHERE product_manufacturer_id IN (' + placeholders + ')',
+            [value for pm_id in pm_ids for value in (pm_id, quantities[pm_id])] + pm_ids
+        )
+
+        # executemany folds this into a single multi-row INSERT
+        cursor.executemany(
+            'INSERT INTO `Order` (user_id, product_manufacturer_id, order_quantity) VALUES (%s, %s, %s)',
+            [(current_user_id, pm_id, quantities[pm_id]) for pm_id in pm_ids]
+        )
+
+        cart_ids = [item['cart_id'] for item in cart_items]
+        cursor.execute('DELETE FROM Cart WHERE cart_id IN (' + ', '.join(['%s'] * len(cart_ids)) + ')', cart_ids)
+
+        db.commit()
+        invalidate('product_manufacturer', *[f'product_manufacturer:{pm_id}' for pm_id in pm_ids])
+
+        items = [
+            {
+                'product_manufacturer_id': pm_id,
+                'order_quantity': quantities[pm_id],
+                'price': stock_rows[pm_id]['price'],
+            }
+            for pm_id in pm_ids
+        ]
+        total = round(sum(item['price'] * item['order_quantity'] for item in items), 2)
+        return jsonify({'message': 'Checkout completed successfully', 'orders': items, 'total_price': total}), 201
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # Delete an order (Admin only)
 @order_bp.route('/<int:order_id>', methods=['DELETE'])
 @jwt_required()
@@ -187,6 +427,7 @@ def update_order(order_id):
                            (order['order_quantity'], order['product_manufacturer_id']))
 
             db.commit()
+            invalidate('product_manufacturer', f'product_manufacturer:{order["product_manufacturer_id"]}')
             return jsonify({'message': 'Order cancelled successfully'}), 200
 
         else:
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from idempotency import idempotent
+from ratelimit import rate_limit
+from pagination import fetch_page, get_page, page_response
+from streaming import stream_query, wants_ndjson
 from datetime import datetime
 import os
 from flasgger import swag_from
@@ -8,9 +12,31 @@ from flasgger import swag_from
 payment_bp = Blueprint('payment', __name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+PAYMENT_BY_ORDER_QUERY = 'SELECT * FROM Payment WHERE order_id = %s'
+PAYMENTS_QUERY = '''
+        SELECT
+            p.payment_id,
+            p.order_id,
+            o.user_id,
+            u.name AS user_name,
+            p.payment_date,
+            p.amount_paid,
+            p.payment_method
+        FROM
+            Payment p
+        INNER JOIN
+            `Order` o ON p.order_id = o.order_id
+        INNER JOIN
+            User u ON o.user_id = u.user_id
+    '''
+# Newest first; payment_id breaks ties between payments made in the same second
+PAYMENT_KEYS = [('p.payment_date', 'payment_date'), ('p.payment_id', 'payment_id')]
+
 # Create a new payment
 @payment_bp.route('', methods=['POST'])
 @jwt_required()
+@rate_limit('30/minute', by='user')
+@idempotent
 @swag_from(os.path.join(current_dir, 'docs','payment' ,'create_payment.yml'))
 def create_payment():
     current_user_id = int(get_jwt_identity())
@@ -41,7 +67,7 @@ def create_payment():
             return jsonify({'message': 'You can only pay for your own orders'}), 403
 
         # Check if a payment already exists for this order
-        cursor.execute('SELECT * FROM Payment WHERE order_id = %s', (order_id,))
+        cursor.execute(PAYMENT_BY_ORDER_QUERY, (order_id,))
         existing_payment = cursor.fetchone()
         if existing_payment:
             return jsonify({'message': 'Payment has already been made for this order'}), 400
@@ -84,7 +110,7 @@ def get_payment_for_order(order_id):
             return jsonify({'message': 'You can only view your own payments'}), 403
 
         # Get payment details
-        cursor.execute('SELECT * FROM Payment WHERE order_id = %s', (order_id,))
+        cursor.execute(PAYMENT_BY_ORDER_QUERY, (order_id,))
         payment = cursor.fetchone()
 
         if not payment:
@@ -106,28 +132,24 @@ def get_all_payments():
     if role != 'admin':
         return jsonify({'message': 'Admins only!'}), 403
 
+    query = PAYMENTS_QUERY + '''
+        ORDER BY
+            p.payment_date DESC
+    '''
+
     db = get_db()
     cursor = db.cursor()
 
     try:
-        cursor.execute('''
-            SELECT
-                p.payment_id,
-                p.order_id,
-                o.user_id,
-                u.name AS user_name,
-                p.payment_date,
-                p.amount_paid,
-                p.payment_method
-            FROM
-                Payment p
-            INNER JOIN
-                `Order` o ON p.order_id = o.order_id
-            INNER JOIN
-                User u ON o.user_id = u.user_id
-            ORDER BY
-                p.payment_date DESC
-        ''')
+        page = get_page(key_count=2)
+        if page:
+            rows, next_cursor = fetch_page(cursor, PAYMENTS_QUERY, PAYMENT_KEYS, page, descending=True)
+            return page_response(rows, next_cursor)
+
+        if wants_ndjson():
+            return stream_query(query)
+
+        cursor.execute(query)
         payments = cursor.fetchall()
         return jsonify(payments), 200
 
@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from cache import cached_query, invalidate
+from autocomplete import get_autocomplete, manufacturer_saved, product_deleted, product_saved
+from bulk import BulkReport, chunked, is_bulk_request, iter_records, optional_number, optional_text
+from pagination import Page, fetch_page, get_page, page_response
+from ratings import empty_rating_stats, get_rating_stats
+from decimal import Decimal
+import math
 import os
 from flasgger import swag_from
 
@@ -12,20 +19,23 @@ product_bp = Blueprint('product', __name__)
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'product' ,'get_products.yml'))
 def get_products():
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM Product')
-    products = cursor.fetchall()
+    page = get_page()
+    if page:
+        cursor = get_db().cursor()
+        rows, next_cursor = fetch_page(cursor, 'SELECT * FROM Product', [('product_id', 'product_id')], page)
+        return page_response(rows, next_cursor)
+
+    products = cached_query('SELECT * FROM Product', tags=['product'])
     return jsonify(products), 200
 
 @product_bp.route('/<int:product_id>', methods=['GET'])
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'product' ,'get_product.yml'))
 def get_product(product_id):
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM Product WHERE product_id = %s', (product_id,))
-    product = cursor.fetchone()
+    product = cached_query(
+        'SELECT * FROM Product WHERE product_id = %s', (product_id,),
+        tags=[f'product:{product_id}'], one=True
+    )
     if product:
         return jsonify(product), 200
     else:
@@ -56,6 +66,8 @@ def create_product():
             (name, description, rating)
         )
         db.commit()
+        invalidate('product', f'product:{cursor.lastrowid}')
+        product_saved(cursor.lastrowid, name)
         return jsonify({'message': 'Product created'}), 201
     except Exception as e:
         db.rollback()
@@ -78,59 +90,300 @@ def delete_product(product_id):
     cursor = db.cursor()
     cursor.execute('DELETE FROM Product WHERE product_id = %s', (product_id,))
     db.commit()
+    invalidate('product', f'product:{product_id}')
+    product_deleted(product_id)
 
     return jsonify({'message': 'Product deleted successfully.'}), 200
 
+PRODUCTS_WITH_MANUFACTURERS_QUERY = """
+    SELECT
+        pm.product_manufacturer_id,
+        p.product_id,
+        p.name AS product_name,
+        m.manufacturer_id,
+        m.name AS manufacturer_name,
+        pm.price,
+        pm.stock
+    FROM
+        Product p
+    INNER JOIN
+        ProductManufacturer pm ON p.product_id = pm.product_id
+    INNER JOIN
+        Manufacturer m ON pm.manufacturer_id = m.manufacturer_id
+"""
+OFFER_ID_KEYS = [('pm.product_manufacturer_id', 'product_manufacturer_id')]
+
+# pm.price is a FLOAT, which cannot be compared for equality reliably; the price keyset and the
+# price filters use its exact two-decimal value, indexed by migration 0005
+PRICE_KEY = 'CAST(pm.price AS DECIMAL(10,2))'
+
+# Faceted listing sort orders: keyset columns and direction. 'rating' sorts on the joined
+# aggregate, which no ProductManufacturer index can provide, so it is a filesort over the
+# filtered offers.
+OFFER_SORTS = {
+    'price': ([(PRICE_KEY, 'price_key'), ('pm.product_manufacturer_id', 'product_manufacturer_id')], False),
+    'price_desc': ([(PRICE_KEY, 'price_key'), ('pm.product_manufacturer_id', 'product_manufacturer_id')], True),
+    'rating': ([('COALESCE(s.average_rating, 0)', 'average_rating'),
+                ('pm.product_manufacturer_id', 'product_manufacturer_id')], True),
+    # ProductManufacturer has no timestamp; ids are assigned in insertion order
+    'newest': ([('pm.product_manufacturer_id', 'product_manufacturer_id')], True),
+}
+FACET_PARAMS = ('min_price', 'max_price', 'in_stock', 'manufacturer_id', 'min_rating', 'sort')
+
+def parse_offer_filters():
+    # Raises ValueError on malformed numbers
+    min_price = float(request.args['min_price']) if 'min_price' in request.args else None
+    max_price = float(request.args['max_price']) if 'max_price' in request.args else None
+    manufacturer_ids = [int(m) for m in request.args.getlist('manufacturer_id')]
+    return min_price, max_price, manufacturer_ids
+
+def price_conditions(min_price, max_price, column='pm.price'):
+    conditions = []
+    params = []
+    if min_price is not None:
+        conditions.append(f'{column} >= %s')
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append(f'{column} <= %s')
+        params.append(max_price)
+    return conditions, params
+
+def offer_conditions(min_price, max_price, manufacturer_ids, min_rating, in_stock):
+    # Filters other than price and manufacturer are shared; those two are kept apart because each is
+    # left out of its own facet counts
+    shared = []
+    shared_params = []
+    if in_stock:
+        shared.append('pm.stock > 0')
+    if min_rating is not None:
+        # Semi-join on the average_rating index rather than testing every offer's joined row
+        shared.append('pm.product_id IN (SELECT product_id FROM ProductRatingStats WHERE average_rating >= %s)')
+        shared_params.append(min_rating)
+    price, price_params = price_conditions(min_price, max_price, PRICE_KEY)
+    manufacturer = []
+    if manufacturer_ids:
+        manufacturer.append('pm.manufacturer_id IN (' + ', '.join(['%s'] * len(manufacturer_ids)) + ')')
+    return shared, shared_params, price, price_params, manufacturer
+
+OFFER_JOINS = """
+    FROM
+        ProductManufacturer pm
+    INNER JOIN
+        Product p ON p.product_id = pm.product_id
+    INNER JOIN
+        Manufacturer m ON m.manufacturer_id = pm.manufacturer_id
+    LEFT JOIN
+        ProductRatingStats s ON s.product_id = pm.product_id
+"""
+OFFER_SELECT = """
+    SELECT
+        pm.product_manufacturer_id,
+        p.product_id,
+        p.name AS product_name,
+        m.manufacturer_id,
+        m.name AS manufacturer_name,
+        pm.price,
+        pm.stock,
+        COALESCE(s.average_rating, 0) AS average_rating,
+        """ + PRICE_KEY + """ AS price_key
+""" + OFFER_JOINS
+
 @product_bp.route('/products_with_manufacturers', methods=['GET'])
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'product' ,'get_products_with_manufacturers.yml'))
 def get_products_with_manufacturers():
-    db = get_db()
-    cursor = db.cursor()
-    query = """
+    if any(param in request.args for param in FACET_PARAMS):
+        return get_faceted_offers()
+
+    page = get_page()
+    if page:
+        cursor = get_db().cursor()
+        rows, next_cursor = fetch_page(cursor, PRODUCTS_WITH_MANUFACTURERS_QUERY, OFFER_ID_KEYS, page)
+        return page_response(rows, next_cursor)
+
+    results = cached_query(PRODUCTS_WITH_MANUFACTURERS_QUERY, tags=['product', 'manufacturer', 'product_manufacturer'])
+    return jsonify(results), 200
+
+def get_faceted_offers():
+    sort = request.args.get('sort', 'newest')
+    if sort not in OFFER_SORTS:
+        return jsonify({'message': 'sort must be one of: ' + ', '.join(OFFER_SORTS)}), 400
+    try:
+        min_price, max_price, manufacturer_ids = parse_offer_filters()
+        min_rating = float(request.args['min_rating']) if 'min_rating' in request.args else None
+    except ValueError:
+        return jsonify({'message': 'min_price, max_price, min_rating and manufacturer_id must be numbers'}), 400
+    in_stock = request.args.get('in_stock', '').lower() in ('1', 'true', 'yes')
+
+    shared, shared_params, price, price_params, manufacturer = offer_conditions(
+        min_price, max_price, manufacturer_ids, min_rating, in_stock
+    )
+
+    page = get_page(key_count=len(OFFER_SORTS[sort][0])) or Page(current_app.config.get('PAGE_DEFAULT_LIMIT', 50))
+    keys, descending = OFFER_SORTS[sort]
+    if page.after is not None and len(keys) > 1:
+        # DECIMAL keys round-trip through the cursor as strings; compare them as exact decimals
+        try:
+            page.after[0] = Decimal(page.after[0])
+        except (ArithmeticError, TypeError, ValueError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+    cursor = get_db().cursor()
+    rows, next_cursor = fetch_page(
+        cursor, OFFER_SELECT, keys, page,
+        shared + price + manufacturer, shared_params + price_params + manufacturer_ids, descending
+    )
+    for row in rows:
+        del row['price_key']
+    response = {'items': rows, 'next_cursor': next_cursor}
+
+    # Facets only on the first page; later pages reuse what the client already has
+    if page.after is None:
+        response['facets'] = offer_facets(cursor, OFFER_JOINS, shared, shared_params,
+                                          price, price_params, manufacturer, manufacturer_ids)
+    return jsonify(response), 200
+
+def offer_facets(cursor, joins, shared, shared_params, price, price_params, manufacturer, manufacturer_ids):
+    # One grouped query over (manufacturer, price bucket). Each facet ignores its own filter, so
+    # manufacturer counts respect the price range and price bucket counts respect the manufacturers.
+    bounds = current_app.config.get('PRODUCT_PRICE_BUCKETS', [0, 25, 50, 100, 250, 500, 1000])
+    in_price = ' AND '.join(price) if price else '1'
+    in_manufacturer = ' AND '.join(manufacturer) if manufacturer else '1'
+    query = f"""
         SELECT
-            p.product_id,
-            p.name AS product_name,
             m.manufacturer_id,
             m.name AS manufacturer_name,
-            pm.price,
-            pm.stock
-        FROM
-            Product p
-        INNER JOIN
-            ProductManufacturer pm ON p.product_id = pm.product_id
-        INNER JOIN
-            Manufacturer m ON pm.manufacturer_id = m.manufacturer_id;
-    """
-    cursor.execute(query)
-    results = cursor.fetchall()
-    return jsonify(results), 200
+            INTERVAL({PRICE_KEY}, {', '.join(['%s'] * len(bounds))}) AS bucket,
+            SUM({in_price}) AS in_price,
+            SUM({in_manufacturer}) AS in_manufacturer
+    """ + joins
+    params = list(bounds) + price_params + manufacturer_ids
+    if shared:
+        query += ' WHERE ' + ' AND '.join(shared)
+        params += shared_params
+    query += ' GROUP BY m.manufacturer_id, bucket'
+    cursor.execute(query, params)
+
+    manufacturers = {}
+    buckets = [0] * (len(bounds) + 1)
+    for row in cursor.fetchall():
+        facet = manufacturers.setdefault(row['manufacturer_id'], {
+            'manufacturer_id': row['manufacturer_id'], 'name': row['manufacturer_name'], 'count': 0,
+        })
+        facet['count'] += int(row['in_price'])
+        buckets[row['bucket']] += int(row['in_manufacturer'])
+
+    # INTERVAL returns 0 below the first bound and i for values in [bounds[i-1], bounds[i])
+    price_facets = [
+        {'min': bounds[i - 1], 'max': bounds[i] if i < len(bounds) else None, 'count': buckets[i]}
+        for i in range(1, len(bounds) + 1)
+    ]
+    return {
+        'manufacturers': sorted((f for f in manufacturers.values() if f['count']),
+                                key=lambda f: (-f['count'], f['manufacturer_id'])),
+        'price': price_facets,
+    }
+
+# Served from the maintained aggregates via the average_rating index
+TOP_RATED_QUERY = """
+    SELECT
+        p.product_id,
+        p.name,
+        s.average_rating
+    FROM
+        ProductRatingStats s
+    INNER JOIN
+        Product p ON p.product_id = s.product_id
+    WHERE
+        s.average_rating > 4
+    ORDER BY
+        s.average_rating DESC
+"""
 
 @product_bp.route('/top_rated_products', methods=['GET'])
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs','product' , 'get_top_rated_products.yml'))
 def get_top_rated_products():
+    results = cached_query(TOP_RATED_QUERY, tags=['product', 'rating'])
+    return jsonify(results), 200
+
+# Most relevant first; the score is computed per query, so this order never comes from an index
+SEARCH_KEYS = [('score', 'score'), ('product_id', 'product_id')]
+
+def search_query(q, min_price, max_price, manufacturer_ids):
+    # Price and manufacturer filters apply to the product's offers, not the product row
+    conditions, condition_params = price_conditions(min_price, max_price)
+    if manufacturer_ids:
+        conditions.append('pm.manufacturer_id IN (' + ', '.join(['%s'] * len(manufacturer_ids)) + ')')
+    params = [q, q] + condition_params + manufacturer_ids
+
+    match = 'MATCH(p.name, p.description) AGAINST (%s IN NATURAL LANGUAGE MODE)'
+    query = f"""
+        SELECT p.product_id, p.name, p.description, p.rating, {match} AS score
+        FROM Product p
+        WHERE {match}
+    """
+    if conditions:
+        query += """
+          AND EXISTS (
+              SELECT 1 FROM ProductManufacturer pm
+              WHERE pm.product_id = p.product_id AND """ + ' AND '.join(conditions) + """
+          )
+        """
+    return 'SELECT * FROM (' + query + ') ranked', params
+
+@product_bp.route('/search', methods=['GET'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'product' ,'search_products.yml'))
+def search_products():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'message': 'Query parameter q is required'}), 400
+
+    try:
+        min_price, max_price, manufacturer_ids = parse_offer_filters()
+    except ValueError:
+        return jsonify({'message': 'min_price, max_price and manufacturer_id must be numbers'}), 400
+
+    page = get_page(key_count=2) or Page(current_app.config.get('PAGE_DEFAULT_LIMIT', 50))
+    select, params = search_query(q, min_price, max_price, manufacturer_ids)
+    cursor = get_db().cursor()
+    rows, next_cursor = fetch_page(cursor, select, SEARCH_KEYS, page, params=params, descending=True)
+    return page_response(rows, next_cursor)
+
+@product_bp.route('/autocomplete', methods=['GET'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'product' ,'autocomplete.yml'))
+def autocomplete():
+    prefix = request.args.get('prefix', '')
+    if not prefix.strip():
+        return jsonify({'message': 'Query parameter prefix is required'}), 400
+
+    limit = request.args.get('limit', current_app.config.get('AUTOCOMPLETE_DEFAULT_LIMIT', 10))
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return jsonify({'message': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'message': 'limit must be greater than 0'}), 400
+    limit = min(limit, current_app.config.get('AUTOCOMPLETE_MAX_LIMIT', 50))
+
+    return jsonify(get_autocomplete().search(prefix, limit)), 200
+
+@product_bp.route('/<int:product_id>/rating', methods=['GET'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'product' ,'get_product_rating.yml'))
+def get_product_rating(product_id):
     db = get_db()
     cursor = db.cursor()
-    query = """
-        SELECT
-            p.product_id,
-            p.name,
-            AVG(r.rating) AS average_rating
-        FROM
-            Product p
-        INNER JOIN
-            Review r ON p.product_id = r.product_id
-        GROUP BY
-            p.product_id
-        HAVING
-            average_rating > 4
-        ORDER BY
-            average_rating DESC;
-    """
-    cursor.execute(query)
-    results = cursor.fetchall()
-    return jsonify(results), 200
+    stats = get_rating_stats(cursor, product_id)
+    if stats:
+        return jsonify(stats), 200
+
+    # No reviews yet; only now pay for the existence check
+    cursor.execute('SELECT product_id FROM Product WHERE product_id = %s', (product_id,))
+    if not cursor.fetchone():
+        return jsonify({'message': 'Product not found'}), 404
+    return jsonify(empty_rating_stats(product_id)), 200
 
 @product_bp.route('/<int:product_id>', methods=['PUT'])
 @jwt_required()
@@ -185,7 +438,183 @@ def update_product(product_id):
 
         cursor.execute(query, tuple(values))
         db.commit()
+        invalidate('product', f'product:{product_id}')
+        if name is not None:
+            product_saved(product_id, name)
         return jsonify({'message': 'Product updated successfully'}), 200
     except Exception as e:
         db.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+def name_lookup_query(table, id_column, count):
+    return (f'SELECT {id_column} AS id, name FROM {table} WHERE name IN (' + ', '.join(['%s'] * count) + ') '
+            f'ORDER BY {id_column} DESC')
+
+def ids_by_name(cursor, table, id_column, names):
+    # The collation is case-insensitive, so match names the same way; the oldest row wins
+    if not names:
+        return {}
+    cursor.execute(name_lookup_query(table, id_column, len(names)), list(names))
+    return {row['name'].casefold(): row['id'] for row in cursor.fetchall()}
+
+def upsert_by_name(cursor, table, id_column, column, records, default):
+    # records maps casefolded name -> (name, value). Existing rows are updated through their primary
+    # key and new rows inserted in the same multi-row statement; a None value leaves the column alone.
+    ids = ids_by_name(cursor, table, id_column, [name for name, _ in records.values()])
+    cursor.executemany(
+        f'INSERT INTO {table} ({id_column}, name, {column}) VALUES (%s, %s, %s) '
+        f'ON DUPLICATE KEY UPDATE {column} = COALESCE(VALUES({column}), {column})',
+        [(ids.get(key), name, value if value is not None or key in ids else default)
+         for key, (name, value) in records.items()]
+    )
+    created = ids_by_name(cursor, table, id_column, [name for key, (name, _) in records.items() if key not in ids])
+    ids.update(created)
+    return ids, created
+
+def validate_catalog_row(record):
+    product_name = optional_text(record.get('product_name'))
+    manufacturer_name = optional_text(record.get('manufacturer_name'))
+    if not product_name or not manufacturer_name:
+        raise ValueError('product_name and manufacturer_name are required')
+    if len(product_name) > 100 or len(manufacturer_name) > 100:
+        raise ValueError('Names are limited to 100 characters')
+    description = optional_text(record.get('description'))
+    if description is not None and len(description) > 255:
+        raise ValueError('description is limited to 255 characters')
+
+    try:
+        price = optional_number(record.get('price'), float)
+        stock = optional_number(record.get('stock'), int)
+        rating = optional_number(record.get('manufacturer_rating'), float)
+    except (TypeError, ValueError):
+        raise ValueError('price, stock and manufacturer_rating must be numbers')
+    # float() accepts 'nan' and 'inf', which MySQL rejects and would fail the whole chunk
+    if any(value is not None and not math.isfinite(value) for value in (price, rating)):
+        raise ValueError('price and manufacturer_rating must be finite numbers')
+    if price is None or price <= 0:
+        raise ValueError('Price must be greater than 0')
+    if stock is not None and stock < 0:
+        raise ValueError('Stock cannot be negative')
+    if rating is not None and (rating < 0 or rating > 5):
+        raise ValueError('Rating must be between 0 and 5')
+
+    return {'product_name': product_name, 'description': description, 'manufacturer_name': manufacturer_name,
+            'manufacturer_rating': rating, 'price': price, 'stock': stock}
+
+def import_catalog_chunk(cursor, rows, report):
+    # Later rows win when a chunk names the same product, manufacturer or offer twice,
+    # except that a blank field does not erase a value given earlier
+    def merge(target, key, name, value):
+        previous = target.get(key)
+        target[key] = (previous[0] if previous else name,
+                       value if value is not None or previous is None else previous[1])
+
+    products = {}
+    manufacturers = {}
+    for row in rows:
+        merge(products, row['product_name'].casefold(), row['product_name'], row['description'])
+        merge(manufacturers, row['manufacturer_name'].casefold(), row['manufacturer_name'],
+              row['manufacturer_rating'])
+    product_ids, new_products = upsert_by_name(cursor, 'Product', 'product_id', 'description', products, None)
+    manufacturer_ids, new_manufacturers = upsert_by_name(
+        cursor, 'Manufacturer', 'manufacturer_id', 'rating', manufacturers, 0
+    )
+
+    offers = {}
+    for row in rows:
+        key = (product_ids[row['product_name'].casefold()], manufacturer_ids[row['manufacturer_name'].casefold()])
+        stock = row['stock'] if row['stock'] is not None or key not in offers else offers[key][1]
+        offers[key] = (row['price'], stock)
+
+    cursor.execute(
+        'SELECT product_manufacturer_id, product_id, manufacturer_id FROM ProductManufacturer '
+        'WHERE (product_id, manufacturer_id) IN (' + ', '.join(['(%s, %s)'] * len(offers)) + ')',
+        [value for key in offers for value in key]
+    )
+    offer_ids = {(row['product_id'], row['manufacturer_id']): row['product_manufacturer_id']
+                 for row in cursor.fetchall()}
+
+    # Upserted on the unique (product_id, manufacturer_id) key, so an offer created meanwhile is updated
+    # rather than duplicated
+    cursor.executemany(
+        'INSERT INTO ProductManufacturer (product_id, manufacturer_id, price, stock) '
+        'VALUES (%s, %s, %s, %s) '
+        'ON DUPLICATE KEY UPDATE price = VALUES(price), stock = COALESCE(VALUES(stock), stock)',
+        [(key[0], key[1], price, stock if stock is not None or key in offer_ids else 0)
+         for key, (price, stock) in offers.items()]
+    )
+
+    report.add('products_created', len(new_products))
+    report.add('manufacturers_created', len(new_manufacturers))
+    report.add('offers_created', sum(1 for key in offers if key not in offer_ids))
+    report.add('offers_updated', sum(1 for key in offers if key in offer_ids))
+
+    tags = ['product', 'manufacturer', 'product_manufacturer']
+    tags += [f'product:{product_id}' for product_id in product_ids.values()]
+    tags += [f'manufacturer:{manufacturer_id}' for manufacturer_id in manufacturer_ids.values()]
+    tags += [f'product_manufacturer:{pm_id}' for pm_id in offer_ids.values()]
+    created = {
+        'products': [(product_id, products[key][0]) for key, product_id in new_products.items()],
+        'manufacturers': [(manufacturer_id, manufacturers[key][0], manufacturers[key][1])
+                          for key, manufacturer_id in new_manufacturers.items()],
+    }
+    return tags, created
+
+@product_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'product' ,'bulk_import.yml'))
+def bulk_import():
+    claims = get_jwt()
+    role = claims.get('role', 'user')
+
+    if role != 'admin':
+        return jsonify({'message': 'Admins only!'}), 403
+
+    if not is_bulk_request():
+        return jsonify({'message': 'Send the catalog as text/csv or application/x-ndjson'}), 415
+
+    report = BulkReport(current_app.config.get('BULK_MAX_ERRORS', 1000))
+    db = get_db()
+    cursor = db.cursor()
+
+    # Products and manufacturers are matched by name, which is not a unique key. Imports run one at a
+    # time so that two of them (or a retry racing the original) cannot both create the same name.
+    cursor.execute("SELECT GET_LOCK('catalog_import', 0) AS acquired")
+    if not cursor.fetchone()['acquired']:
+        return jsonify({'message': 'Another catalog import is running'}), 409
+    try:
+        for chunk in chunked(iter_records(), current_app.config.get('BULK_CHUNK_SIZE', 1000)):
+            rows = []
+            row_numbers = []
+            for row_number, record, error in chunk:
+                report.add('rows')
+                if error is None:
+                    try:
+                        rows.append(validate_catalog_row(record))
+                        row_numbers.append(row_number)
+                        continue
+                    except ValueError as e:
+                        error = str(e)
+                report.error(row_number, error)
+            if not rows:
+                continue
+
+            # One transaction per chunk; a failed chunk is reported and the import carries on
+            try:
+                tags, created = import_catalog_chunk(cursor, rows, report)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                for row_number in row_numbers:
+                    report.error(row_number, f'Chunk not imported: {e}')
+                continue
+
+            invalidate(*tags)
+            for product_id, name in created['products']:
+                product_saved(product_id, name)
+            for manufacturer_id, name, rating in created['manufacturers']:
+                manufacturer_saved(manufacturer_id, name, rating if rating is not None else 0)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('catalog_import')")
+
+    return jsonify(report.to_dict()), 200
@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from cache import cached_query, invalidate
+from bulk import BulkReport, chunked, is_bulk_request, iter_records, optional_number
+import math
 import os
 from flasgger import swag_from
 
@@ -12,9 +15,6 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'product_manufacturer','get_product_manufacturers.yml'))
 def get_product_manufacturers():
-    db = get_db()
-    cursor = db.cursor()
-
     query = '''
     SELECT
         pm.product_manufacturer_id,
@@ -32,8 +32,7 @@ def get_product_manufacturers():
         Manufacturer m ON pm.manufacturer_id = m.manufacturer_id
     '''
 
-    cursor.execute(query)
-    results = cursor.fetchall()
+    results = cached_query(query, tags=['product', 'manufacturer', 'product_manufacturer'])
     return jsonify(results), 200
 
 # Get a specific product-manufacturer association
@@ -41,9 +40,6 @@ def get_product_manufacturers():
 @jwt_required()
 @swag_from(os.path.join(current_dir, 'docs', 'product_manufacturer','get_product_manufacturer.yml'))
 def get_product_manufacturer(pm_id):
-    db = get_db()
-    cursor = db.cursor()
-
     query = '''
     SELECT
         pm.product_manufacturer_id,
@@ -63,8 +59,14 @@ def get_product_manufacturer(pm_id):
         pm.product_manufacturer_id = %s
     '''
 
-    cursor.execute(query, (pm_id,))
-    result = cursor.fetchone()
+    def tags(row):
+        # Product and manufacturer names are embedded in the row
+        if not row:
+            return [f'product_manufacturer:{pm_id}']
+        return [f'product_manufacturer:{pm_id}', f'product:{row["product_id"]}',
+                f'manufacturer:{row["manufacturer_id"]}']
+
+    result = cached_query(query, (pm_id,), tags=tags, one=True)
     if not result:
         return jsonify({'message': 'ProductManufacturer entry not found'}), 404
     return jsonify(result), 200
@@ -119,6 +121,7 @@ def create_product_manufacturer():
         ''', (product_id, manufacturer_id, price, stock))
 
         db.commit()
+        invalidate('product_manufacturer', f'product_manufacturer:{cursor.lastrowid}')
         return jsonify({'message': 'ProductManufacturer entry created successfully'}), 201
 
     except Exception as e:
@@ -178,6 +181,7 @@ def update_product_manufacturer(pm_id):
 
         cursor.execute(query, tuple(values))
         db.commit()
+        invalidate('product_manufacturer', f'product_manufacturer:{pm_id}')
         return jsonify({'message': 'ProductManufacturer entry updated successfully'}), 200
 
     except Exception as e:
@@ -215,8 +219,151 @@ def delete_product_manufacturer(pm_id):
         # Delete the entry
         cursor.execute('DELETE FROM ProductManufacturer WHERE product_manufacturer_id = %s', (pm_id,))
         db.commit()
+        invalidate('product_manufacturer', f'product_manufacturer:{pm_id}')
         return jsonify({'message': 'ProductManufacturer entry deleted successfully'}), 200
 
     except Exception as e:
         db.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+def validate_stock_entry(record):
+    try:
+        pm_id = optional_number(record.get('product_manufacturer_id'), int)
+        price = optional_number(record.get('price'), float)
+        stock = optional_number(record.get('stock'), int)
+        stock_delta = optional_number(record.get('stock_delta'), int)
+    except (TypeError, ValueError):
+        raise ValueError('product_manufacturer_id, price, stock and stock_delta must be numbers')
+    if pm_id is None:
+        raise ValueError('product_manufacturer_id is required')
+    if price is None and stock is None and stock_delta is None:
+        raise ValueError('At least one of price, stock or stock_delta must be provided')
+    if stock is not None and stock_delta is not None:
+        raise ValueError('stock and stock_delta cannot be combined')
+    # float() accepts 'nan' and 'inf', which MySQL rejects and would fail the whole chunk
+    if price is not None and not math.isfinite(price):
+        raise ValueError('price must be a finite number')
+    if price is not None and price <= 0:
+        raise ValueError('Price must be greater than 0')
+    if stock is not None and stock < 0:
+        raise ValueError('Stock cannot be negative')
+    return pm_id, price, stock, stock_delta
+
+def apply_stock_chunk(cursor, entries):
+    # entries maps product_manufacturer_id -> (row_numbers, price, stock, stock_delta), row_numbers listing
+    # every input row folded into the entry. Returns the applied ids and (row_numbers, reason) for entries
+    # that were skipped.
+    cursor.execute('''
+        CREATE TEMPORARY TABLE IF NOT EXISTS pm_bulk_update (
+            product_manufacturer_id int NOT NULL PRIMARY KEY,
+            price float NULL,
+            stock int NULL,
+            stock_delta int NOT NULL DEFAULT 0
+        ) ENGINE=MEMORY
+    ''')
+    # Pooled connections keep their temporary tables, so clear out the previous chunk
+    cursor.execute('DELETE FROM pm_bulk_update')
+    cursor.executemany(
+        'INSERT INTO pm_bulk_update (product_manufacturer_id, price, stock, stock_delta) VALUES (%s, %s, %s, %s)',
+        [(pm_id, price, stock, stock_delta) for pm_id, (_, price, stock, stock_delta) in entries.items()]
+    )
+
+    # Lock the target rows in primary key order, the same order checkout uses
+    cursor.execute('''
+        SELECT pm.product_manufacturer_id, pm.stock
+        FROM ProductManufacturer pm
+        INNER JOIN pm_bulk_update t ON t.product_manufacturer_id = pm.product_manufacturer_id
+        ORDER BY pm.product_manufacturer_id
+        FOR UPDATE
+    ''')
+    current = {row['product_manufacturer_id']: row['stock'] for row in cursor.fetchall()}
+
+    skipped = {}
+    for pm_id, (row_numbers, _, stock, stock_delta) in entries.items():
+        if pm_id not in current:
+            skipped[pm_id] = (row_numbers, f'ProductManufacturer {pm_id} not found')
+        elif (stock if stock is not None else current[pm_id] or 0) + stock_delta < 0:
+            skipped[pm_id] = (row_numbers, f'Stock of ProductManufacturer {pm_id} cannot go below 0')
+    if skipped:
+        cursor.execute(
+            'DELETE FROM pm_bulk_update WHERE product_manufacturer_id IN (' + ', '.join(['%s'] * len(skipped)) + ')',
+            list(skipped)
+        )
+
+    cursor.execute('''
+        UPDATE ProductManufacturer pm
+        INNER JOIN pm_bulk_update t ON t.product_manufacturer_id = pm.product_manufacturer_id
+        SET
+            pm.price = COALESCE(t.price, pm.price),
+            pm.stock = COALESCE(t.stock, pm.stock, 0) + t.stock_delta
+    ''')
+    return [pm_id for pm_id in entries if pm_id not in skipped], list(skipped.values())
+
+# Bulk price and stock update (Admin only)
+@product_manufacturer_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'product_manufacturer','bulk_update_product_manufacturers.yml'))
+def bulk_update_product_manufacturers():
+    claims = get_jwt()
+    role = claims.get('role', 'user')
+
+    if role != 'admin':
+        return jsonify({'message': 'Admins only!'}), 403
+
+    if not is_bulk_request(allow_json=True):
+        return jsonify({'message': 'Send entries as application/json, text/csv or application/x-ndjson'}), 415
+
+    report = BulkReport(current_app.config.get('BULK_MAX_ERRORS', 1000))
+    report.add('applied', 0)
+    report.add('skipped', 0)
+    report.add('invalid', 0)
+    db = get_db()
+    cursor = db.cursor()
+
+    for chunk in chunked(iter_records(), current_app.config.get('BULK_CHUNK_SIZE', 1000)):
+        # Entries for the same row are folded together: a later price or stock replaces an earlier one,
+        # stock deltas add up. Every folded row number is kept so each input row is counted and reported.
+        entries = {}
+        for row_number, record, error in chunk:
+            if error is None:
+                try:
+                    pm_id, price, stock, stock_delta = validate_stock_entry(record)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report.error(row_number, error)
+                report.add('invalid')
+                continue
+
+            row_numbers, previous_price, previous_stock, previous_delta = entries.get(pm_id, ((), None, None, 0))
+            if stock is not None:
+                previous_stock, previous_delta = stock, 0
+            entries[pm_id] = (
+                row_numbers + (row_number,),
+                price if price is not None else previous_price,
+                previous_stock,
+                previous_delta + (stock_delta or 0),
+            )
+        if not entries:
+            continue
+
+        try:
+            applied, skipped = apply_stock_chunk(cursor, entries)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for row_numbers, *_ in entries.values():
+                for row_number in row_numbers:
+                    report.error(row_number, f'Chunk not applied: {e}')
+                report.add('skipped', len(row_numbers))
+            continue
+
+        report.add('applied', sum(len(entries[pm_id][0]) for pm_id in applied))
+        for row_numbers, reason in skipped:
+            for row_number in row_numbers:
+                report.error(row_number, reason)
+            report.add('skipped', len(row_numbers))
+        if applied:
+            invalidate('product_manufacturer', *[f'product_manufacturer:{pm_id}' for pm_id in applied])
+
+    return jsonify(report.to_dict()), 200
@@ -1,31 +1,27 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from cache import invalidate
+from pagination import encode_cursor, fetch_page, get_page, keyset_condition, page_response
+from ratelimit import rate_limit
+from ratings import apply_rating_change, stored_rating
+from streaming import stream_query, wants_ndjson
 import os 
 from flasgger import swag_from
 
 review_bp = Blueprint('review', __name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Get all reviews for a specific product
-@review_bp.route('/product/<int:product_id>', methods=['GET'])
-@jwt_required()
-@swag_from(os.path.join(current_dir, 'docs', 'review' , 'get_reviews_for_product.yml'))
-def get_reviews_for_product(product_id):
-    db = get_db()
-    cursor = db.cursor()
-    
-    # Check if the product exists
-    cursor.execute('SELECT * FROM Product WHERE product_id = %s', (product_id,))
-    product = cursor.fetchone()
-    if not product:
-        return jsonify({'message': 'Product not found'}), 404
-
-    cursor.execute('''
+# Newest first; review_id breaks ties between reviews posted in the same second
+REVIEW_KEYS = [('r.review_date', 'review_date'), ('r.review_id', 'review_id')]
+USER_REVIEW_QUERY = 'SELECT * FROM Review WHERE user_id = %s AND product_id = %s'
+REVIEWS_QUERY = '''
         SELECT
             r.review_id,
             r.user_id,
             u.name AS user_name,
+            r.product_id,
+            p.name AS product_name,
             r.rating,
             r.review_text,
             r.review_date
@@ -33,12 +29,75 @@ def get_reviews_for_product(product_id):
             Review r
         INNER JOIN
             User u ON r.user_id = u.user_id
+        INNER JOIN
+            Product p ON r.product_id = p.product_id
+    '''
+
+def review_listing_query(product_id, rating=None, page=None):
+    # Filters and the keyset condition go in the join, so the product row still comes back
+    # (with NULL review columns) when nothing matches and the 404 check needs no extra query
+    join = ['r.product_id = p.product_id']
+    params = []
+    if rating is not None:
+        join.append('r.rating = %s')
+        params.append(rating)
+    if page and page.after is not None:
+        condition, condition_params = keyset_condition([c for c, _ in REVIEW_KEYS], page.after, descending=True)
+        join.append(condition)
+        params.extend(condition_params)
+
+    query = '''
+        SELECT
+            r.review_id,
+            r.user_id,
+            u.name AS user_name,
+            r.rating,
+            r.review_text,
+            r.review_date
+        FROM
+            Product p
+        LEFT JOIN
+            (Review r INNER JOIN User u ON r.user_id = u.user_id) ON ''' + ' AND '.join(join) + '''
         WHERE
-            r.product_id = %s
+            p.product_id = %s
         ORDER BY
-            r.review_date DESC
-    ''', (product_id,))
-    reviews = cursor.fetchall()
+            r.review_date DESC, r.review_id DESC
+    '''
+    params.append(product_id)
+    if page:
+        query += ' LIMIT %s'
+        params.append(page.limit + 1)
+    return query, params
+
+# Get all reviews for a specific product
+@review_bp.route('/product/<int:product_id>', methods=['GET'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'review' , 'get_reviews_for_product.yml'))
+def get_reviews_for_product(product_id):
+    rating = request.args.get('rating')
+    if rating is not None:
+        if rating not in ('0', '1', '2', '3', '4', '5'):
+            return jsonify({'message': 'rating must be a whole number of stars between 0 and 5'}), 400
+        rating = int(rating)
+
+    db = get_db()
+    cursor = db.cursor()
+
+    page = get_page(key_count=2)
+    query, params = review_listing_query(product_id, rating, page)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    if not rows:
+        return jsonify({'message': 'Product not found'}), 404
+    reviews = [row for row in rows if row['review_id'] is not None]
+
+    if page:
+        next_cursor = None
+        if len(reviews) > page.limit:
+            reviews = reviews[:page.limit]
+            next_cursor = encode_cursor([reviews[-1][field] for _, field in REVIEW_KEYS])
+        return page_response(reviews, next_cursor)
+
     return jsonify(reviews), 200
 
 # Get a specific review
@@ -75,6 +134,7 @@ def get_review(review_id):
 # Create a new review
 @review_bp.route('', methods=['POST'])
 @jwt_required()
+@rate_limit('10/minute', by='user')
 @swag_from(os.path.join(current_dir, 'docs', 'review' ,'create_review.yml'))
 def create_review():
     current_user_id = int(get_jwt_identity())
@@ -88,6 +148,7 @@ def create_review():
 
     if not (0 <= rating <= 5):
         return jsonify({'message': 'Rating must be between 0 and 5'}), 400
+    rating = stored_rating(rating)
 
     db = get_db()
     cursor = db.cursor()
@@ -100,7 +161,7 @@ def create_review():
             return jsonify({'message': 'Product not found'}), 404
 
         # Check if the user has already reviewed this product
-        cursor.execute('SELECT * FROM Review WHERE user_id = %s AND product_id = %s', (current_user_id, product_id))
+        cursor.execute(USER_REVIEW_QUERY, (current_user_id, product_id))
         existing_review = cursor.fetchone()
         if existing_review:
             return jsonify({'message': 'You have already reviewed this product'}), 400
@@ -110,7 +171,9 @@ def create_review():
             INSERT INTO Review (user_id, product_id, rating, review_text)
             VALUES (%s, %s, %s, %s)
         ''', (current_user_id, product_id, rating, review_text))
+        apply_rating_change(cursor, product_id, new_rating=rating)
         db.commit()
+        invalidate('rating')
         return jsonify({'message': 'Review created successfully'}), 201
 
     except Exception as e:
@@ -132,13 +195,15 @@ def update_review(review_id):
 
     if rating is not None and not (0 <= rating <= 5):
         return jsonify({'message': 'Rating must be between 0 and 5'}), 400
+    if rating is not None:
+        rating = stored_rating(rating)
 
     db = get_db()
     cursor = db.cursor()
 
     try:
-        # Fetch the review
-        cursor.execute('SELECT * FROM Review WHERE review_id = %s', (review_id,))
+        # Fetch the review, locked so a concurrent change cannot move the rating we adjust from
+        cursor.execute('SELECT * FROM Review WHERE review_id = %s FOR UPDATE', (review_id,))
         review = cursor.fetchone()
         if not review:
             return jsonify({'message': 'Review not found'}), 404
@@ -165,7 +230,11 @@ def update_review(review_id):
         query = 'UPDATE Review SET ' + ', '.join(fields) + ' WHERE review_id = %s'
 
         cursor.execute(query, tuple(values))
+        if rating is not None and cursor.rowcount == 1:
+            apply_rating_change(cursor, review['product_id'], review['rating'], rating)
         db.commit()
+        if rating is not None:
+            invalidate('rating')
         return jsonify({'message': 'Review updated successfully'}), 200
 
     except Exception as e:
@@ -182,8 +251,8 @@ def delete_review(review_id):
     cursor = db.cursor()
 
     try:
-        # Fetch the review
-        cursor.execute('SELECT * FROM Review WHERE review_id = %s', (review_id,))
+        # Fetch the review, locked until the aggregate has been adjusted
+        cursor.execute('SELECT * FROM Review WHERE review_id = %s FOR UPDATE', (review_id,))
         review = cursor.fetchone()
         if not review:
             return jsonify({'message': 'Review not found'}), 404
@@ -196,7 +265,10 @@ def delete_review(review_id):
 
         # Delete the review
         cursor.execute('DELETE FROM Review WHERE review_id = %s', (review_id,))
+        if cursor.rowcount == 1:
+            apply_rating_change(cursor, review['product_id'], old_rating=review['rating'])
         db.commit()
+        invalidate('rating')
         return jsonify({'message': 'Review deleted successfully'}), 200
 
     except Exception as e:
@@ -214,26 +286,22 @@ def get_all_reviews():
     if role != 'admin':
         return jsonify({'message': 'Admins only!'}), 403
 
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        SELECT
-            r.review_id,
-            r.user_id,
-            u.name AS user_name,
-            r.product_id,
-            p.name AS product_name,
-            r.rating,
-            r.review_text,
-            r.review_date
-        FROM
-            Review r
-        INNER JOIN
-            User u ON r.user_id = u.user_id
-        INNER JOIN
-            Product p ON r.product_id = p.product_id
+    query = REVIEWS_QUERY + '''
         ORDER BY
             r.review_date DESC
-    ''')
+    '''
+
+    db = get_db()
+    cursor = db.cursor()
+
+    page = get_page(key_count=2)
+    if page:
+        rows, next_cursor = fetch_page(cursor, REVIEWS_QUERY, REVIEW_KEYS, page, descending=True)
+        return page_response(rows, next_cursor)
+
+    if wants_ndjson():
+        return stream_query(query)
+
+    cursor.execute(query)
     reviews = cursor.fetchall()
     return jsonify(reviews), 200
\ No newline at end of file
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from db import get_db
+from pagination import fetch_page, get_page, page_response
+from streaming import stream_query, wants_ndjson
 from datetime import datetime
 import os
 from flasgger import swag_from
@@ -8,6 +10,8 @@ from flasgger import swag_from
 shipping_bp = Blueprint('shipping', __name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+SHIPPING_BY_ORDER_QUERY = 'SELECT * FROM Shipping WHERE order_id = %s'
+
 # Create a new shipping record (Admin only)
 @shipping_bp.route('', methods=['POST'])
 @jwt_required()
@@ -47,7 +51,7 @@ def create_shipping():
             return jsonify({'message': 'Address not found'}), 404
 
         # Check if the shipping record already exists for this order
-        cursor.execute('SELECT * FROM Shipping WHERE order_id = %s', (order_id,))
+        cursor.execute(SHIPPING_BY_ORDER_QUERY, (order_id,))
         existing_shipping = cursor.fetchone()
         if existing_shipping:
             return jsonify({'message': 'Shipping record already exists for this order'}), 400
@@ -217,35 +221,50 @@ def get_all_shippings():
     if role != 'admin':
         return jsonify({'message': 'Admins only!'}), 403
 
+    select = '''
+        SELECT
+            s.shipping_id,
+            s.order_id,
+            o.user_id,
+            u.name AS user_name,
+            s.address_id,
+            a.country,
+            a.city,
+            a.zip_code,
+            a.address_line,
+            s.shipping_date,
+            s.estimated_delivery,
+            s.status
+        FROM
+            Shipping s
+        INNER JOIN
+            `Order` o ON s.order_id = o.order_id
+        INNER JOIN
+            User u ON o.user_id = u.user_id
+        INNER JOIN
+            Address a ON s.address_id = a.address_id
+    '''
+    query = select + '''
+        ORDER BY
+            s.shipping_date DESC
+    '''
+
     db = get_db()
     cursor = db.cursor()
 
     try:
-        cursor.execute('''
-            SELECT
-                s.shipping_id,
-                s.order_id,
-                o.user_id,
-                u.name AS user_name,
-                s.address_id,
-                a.country,
-                a.city,
-                a.zip_code,
-                a.address_line,
-                s.shipping_date,
-                s.estimated_delivery,
-                s.status
-            FROM
-                Shipping s
-            INNER JOIN
-                `Order` o ON s.order_id = o.order_id
-            INNER JOIN
-                User u ON o.user_id = u.user_id
-            INNER JOIN
-                Address a ON s.address_id = a.address_id
-            ORDER BY
-                s.shipping_date DESC
-        ''')
+        # shipping_date is nullable, so pages are keyed on the id alone (newest records first)
+        page = get_page()
+        if page:
+            rows, next_cursor = fetch_page(
+                cursor, select, [('s.shipping_id', 'shipping_id')], page, descending=True
+            )
+            return page_response(rows, next_cursor)
+
+        if wants_ndjson():
+            return stream_query(query)
+
+        cursor.execute(query)
         shippings = cursor.fetchall()
         return jsonify(shippings), 200
 
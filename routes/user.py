@@ -1,8 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from db import get_db
+from bulk import BulkReport, chunked, is_bulk_request, iter_records, optional_text
+from db import duplicate_key, get_db
+from pagination import fetch_page, get_page, page_response
+from streaming import stream_query, wants_ndjson
+from itertools import islice
 import os
-from werkzeug.security import generate_password_hash
+from passwords import HasherBusy, busy_response, get_password_hasher, hash_password
+from revocation import revoke_user, user_revoked
 from flasgger import swag_from
 
 
@@ -24,6 +29,15 @@ def get_users():
     
     db = get_db()
     cursor = db.cursor()
+
+    page = get_page()
+    if page:
+        rows, next_cursor = fetch_page(cursor, 'SELECT * FROM user', [('user_id', 'user_id')], page)
+        return page_response(rows, next_cursor)
+
+    if wants_ndjson():
+        return stream_query('SELECT * FROM user')
+
     cursor.execute('SELECT * FROM user')
     users = cursor.fetchall()
     return jsonify(users), 200
@@ -44,7 +58,10 @@ def delete_user(user_id):
     db = get_db()
     cursor = db.cursor()
     cursor.execute('DELETE FROM User WHERE user_id = %s', (user_id,))
+    # The deleted user's access tokens must stop working now, not when they expire
+    not_before = revoke_user(cursor, user_id)
     db.commit()
+    user_revoked(user_id, not_before)
     
     return jsonify({'message': 'User deleted successfully.'}), 200
 
@@ -74,6 +91,14 @@ def update_user(user_id):
     if not any([name, email, phone_number, password, new_role]):
         return jsonify({'message': 'At least one field must be provided'}), 400
 
+    # Hash before taking a connection, so the scrypt call does not hold a pool slot and an open transaction
+    hashed_password = None
+    if password is not None:
+        try:
+            hashed_password = hash_password(password)
+        except HasherBusy:
+            return busy_response()
+
     db = get_db()
     cursor = db.cursor()
 
@@ -106,8 +131,7 @@ def update_user(user_id):
             fields.append('phone_number = %s')
             values.append(phone_number)
 
-        if password is not None:
-            hashed_password = generate_password_hash(password)
+        if hashed_password is not None:
             fields.append('password = %s')
             values.append(hashed_password)
 
@@ -124,9 +148,154 @@ def update_user(user_id):
         query = 'UPDATE User SET ' + ', '.join(fields) + ' WHERE user_id = %s'
 
         cursor.execute(query, tuple(values))
+
+        # Existing tokens must not outlive the old password, nor keep an admin claim after a demotion
+        not_before = None
+        if password is not None or (new_role == 'user' and user['role'] == 'admin'):
+            not_before = revoke_user(cursor, user_id)
+
         db.commit()
+        if not_before is not None:
+            user_revoked(user_id, not_before)
         return jsonify({'message': 'User updated successfully'}), 200
 
     except Exception as e:
         db.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+def validate_user_row(record):
+    name = optional_text(record.get('name'))
+    email = optional_text(record.get('email'))
+    password = record.get('password')
+    password = str(password) if password not in (None, '') else None
+    if not name or not email or not password:
+        raise ValueError('Name, email, and password are required.')
+    phone_number = optional_text(record.get('phone_number'))
+    role = optional_text(record.get('role')) or 'user'
+    if len(name) > 100 or len(email) > 100:
+        raise ValueError('name and email are limited to 100 characters')
+    if phone_number is not None and len(phone_number) > 15:
+        raise ValueError('phone_number is limited to 15 characters')
+    if role not in ['user', 'admin']:
+        raise ValueError('Invalid role')
+    return {'name': name, 'email': email, 'password': password, 'phone_number': phone_number, 'role': role}
+
+def drop_duplicate_users(cursor, rows, report):
+    # Rows whose email or phone number repeats an earlier row or an existing user, checked
+    # before hashing so no pool time is spent on them
+    emails = [row['email'] for _, row in rows]
+    phones = [row['phone_number'] for _, row in rows if row['phone_number'] is not None]
+    query = 'SELECT email, phone_number FROM User WHERE email IN (' + ', '.join(['%s'] * len(emails)) + ')'
+    if phones:
+        query += ' OR phone_number IN (' + ', '.join(['%s'] * len(phones)) + ')'
+    cursor.execute(query, emails + phones)
+    taken_emails = set()
+    taken_phones = set()
+    for user in cursor.fetchall():
+        taken_emails.add(user['email'].casefold())
+        if user['phone_number'] is not None:
+            taken_phones.add(user['phone_number'])
+
+    kept = []
+    for row_number, row in rows:
+        if row['email'].casefold() in taken_emails:
+            report.error(row_number, 'User already exists.')
+        elif row['phone_number'] is not None and row['phone_number'] in taken_phones:
+            report.error(row_number, 'Phone number is already in use.')
+        else:
+            kept.append((row_number, row))
+        taken_emails.add(row['email'].casefold())
+        if row['phone_number'] is not None:
+            taken_phones.add(row['phone_number'])
+    return kept
+
+def insert_users(cursor, rows):
+    # One multi-row INSERT; if a concurrent registration took an email or phone number in the
+    # meantime, fall back to row-by-row inserts so only the clashing rows are rejected
+    values = [(row['name'], row['email'], row['password'], row['phone_number'], row['role']) for _, row in rows]
+    columns = 'INSERT INTO User (name, email, password, phone_number, role) VALUES '
+    try:
+        cursor.execute(columns + ', '.join(['(%s, %s, %s, %s, %s)'] * len(values)),
+                       [value for row in values for value in row])
+        return len(values), []
+    except Exception as e:
+        if duplicate_key(e) is None:
+            raise
+
+    created = 0
+    rejected = []
+    for (row_number, _), row in zip(rows, values):
+        try:
+            cursor.execute(columns + '(%s, %s, %s, %s, %s)', row)
+            created += 1
+        except Exception as e:
+            key = duplicate_key(e)
+            if key is None:
+                raise
+            rejected.append((row_number, 'Phone number is already in use.' if key == 'phone_number'
+                             else 'User already exists.'))
+    return created, rejected
+
+# Bulk user provisioning, e.g. migrating accounts from another shop (Admin only)
+@user_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@swag_from(os.path.join(current_dir, 'docs', 'user' ,'bulk_create_users.yml'))
+def bulk_create_users():
+    claims = get_jwt()
+    role = claims.get('role', 'user')
+
+    if role != 'admin':
+        return jsonify({'message': 'Admins only!'}), 403
+
+    if not is_bulk_request(allow_json=True):
+        return jsonify({'message': 'Send users as application/json, text/csv or application/x-ndjson'}), 415
+
+    # Every row costs a password hash inside this request, so the batch is capped and read up front:
+    # an oversized body is refused before anything is hashed or inserted
+    max_rows = current_app.config.get('BULK_USER_MAX_ROWS', 200)
+    records = list(islice(iter_records(), max_rows + 1))
+    if len(records) > max_rows:
+        return jsonify({'message': f'At most {max_rows} users per request'}), 413
+
+    report = BulkReport(current_app.config.get('BULK_MAX_ERRORS', 1000))
+    report.add('created', 0)
+    hasher = get_password_hasher()
+    db = get_db()
+    cursor = db.cursor()
+
+    for chunk in chunked(records, current_app.config.get('BULK_CHUNK_SIZE', 1000)):
+        rows = []
+        for row_number, record, error in chunk:
+            report.add('rows')
+            if error is None:
+                try:
+                    rows.append((row_number, validate_user_row(record)))
+                    continue
+                except ValueError as e:
+                    error = str(e)
+            report.error(row_number, error)
+        if not rows:
+            continue
+
+        try:
+            rows = drop_duplicate_users(cursor, rows, report)
+            db.commit()
+            if not rows:
+                continue
+            # Hashing runs outside any transaction; the pool keeps room for concurrent logins
+            hashes = hasher.hash_many([row['password'] for _, row in rows])
+            rows = [(row_number, dict(row, password=password_hash))
+                    for (row_number, row), password_hash in zip(rows, hashes)]
+            created, rejected = insert_users(cursor, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for row_number, _ in rows:
+                report.error(row_number, f'Chunk not imported: {e}')
+            continue
+
+        report.add('created', created)
+        for row_number, message in rejected:
+            report.error(row_number, message)
+
+    return jsonify(report.to_dict()), 200
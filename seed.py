@@ -0,0 +1,242 @@
+import bisect
+import itertools
+import random
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+from db import db_cli, get_db
+from ratings import rebuild_rating_stats
+
+# Row counts at --scale 1; orders grow to 10M at --scale 100
+BASE_COUNTS = {
+    'users': 10_000,
+    'manufacturers': 200,
+    'products': 5_000,
+    'orders': 100_000,
+    'reviews': 40_000,
+    'cart_users': 2_000,
+}
+
+ORDER_STATUSES = ['Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled']
+ORDER_STATUS_WEIGHTS = [10, 10, 15, 60, 5]
+RATING_WEIGHTS = [1, 3, 5, 15, 36, 40]
+PAYMENT_METHODS = ['Credit Card', 'Debit Card', 'PayPal', 'Bank Transfer']
+COUNTRIES = [('Turkey', ['Istanbul', 'Ankara', 'Izmir']), ('Germany', ['Berlin', 'Munich']),
+             ('United States', ['New York', 'Austin', 'Seattle']), ('United Kingdom', ['London', 'Leeds'])]
+WORDS = ['wireless', 'smart', 'portable', 'ultra', 'pro', 'mini', 'classic', 'digital', 'eco', 'max',
+         'headphones', 'speaker', 'keyboard', 'monitor', 'camera', 'charger', 'lamp', 'watch', 'drone', 'router']
+
+
+class SkewedSampler:
+    # Zipf-like sampling: the item at popularity rank r is drawn with weight 1 / r**exponent.
+    # Ranks are shuffled onto ids so popular items are spread across the id space.
+    def __init__(self, ids, exponent, rng):
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, len(self.ids) + 1)))
+
+    def sample(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return self.ids[bisect.bisect_left(self.cumulative, point)]
+
+    def sample_distinct(self, k):
+        k = min(k, len(self.ids))
+        chosen = set()
+        while len(chosen) < k:
+            chosen.add(self.sample())
+        return chosen
+
+
+def _next_id(cursor, table, column):
+    cursor.execute(f'SELECT COALESCE(MAX({column}), 0) AS max_id FROM {table}')
+    return cursor.fetchone()['max_id'] + 1
+
+
+def _bulk_insert(db, cursor, table, columns, rows, chunk_size):
+    # executemany rewrites INSERT ... VALUES into multi-row statements; commit per chunk
+    query = (f'INSERT INTO {table} (' + ', '.join(columns) + ') VALUES ('
+             + ', '.join(['%s'] * len(columns)) + ')')
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            cursor.executemany(query, chunk)
+            db.commit()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        cursor.executemany(query, chunk)
+        db.commit()
+        total += len(chunk)
+    return total
+
+
+def _random_date(rng, now, days):
+    return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def seed_database(db, scale=1.0, seed=42, chunk_size=5000, password='password', echo=print):
+    rng = random.Random(seed)
+    counts = {name: max(1, int(count * scale)) for name, count in BASE_COUNTS.items()}
+    now = datetime.now().replace(microsecond=0)
+    cursor = db.cursor()
+    cursor.execute('SET unique_checks = 0')
+
+    # Hashing is deliberately slow, so every generated user shares one hash
+    password_hash = generate_password_hash(password, current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt'))
+
+    first_user = _next_id(cursor, 'User', 'user_id')
+    user_ids = range(first_user, first_user + counts['users'])
+    n = _bulk_insert(db, cursor, 'User', ['user_id', 'name', 'email', 'phone_number', 'password', 'role'], (
+        (user_id, f'User {user_id}', f'user{user_id}@example.com', f'+9{user_id:012d}', password_hash, 'user')
+        for user_id in user_ids
+    ), chunk_size)
+    echo(f'users: {n}')
+
+    # One to three addresses per user; remember each user's addresses for shipping rows
+    first_address = _next_id(cursor, 'Address', 'address_id')
+    user_addresses = {}
+    address_rows = []
+    address_id = first_address
+    for user_id in user_ids:
+        count = rng.choices([1, 2, 3], [70, 25, 5])[0]
+        user_addresses[user_id] = (address_id, count)
+        for _ in range(count):
+            country, cities = rng.choice(COUNTRIES)
+            address_rows.append((address_id, user_id, country, rng.choice(cities),
+                                 f'{rng.randint(10000, 99999)}', f'{rng.randint(1, 300)} Main Street'))
+            address_id += 1
+    n = _bulk_insert(db, cursor, 'Address',
+                     ['address_id', 'user_id', 'country', 'city', 'zip_code', 'address_line'],
+                     address_rows, chunk_size)
+    del address_rows
+    echo(f'addresses: {n}')
+
+    first_manufacturer = _next_id(cursor, 'Manufacturer', 'manufacturer_id')
+    manufacturer_ids = range(first_manufacturer, first_manufacturer + counts['manufacturers'])
+    n = _bulk_insert(db, cursor, 'Manufacturer', ['manufacturer_id', 'name', 'rating'], (
+        (manufacturer_id, f'Manufacturer {manufacturer_id}', round(rng.uniform(2.5, 5), 1))
+        for manufacturer_id in manufacturer_ids
+    ), chunk_size)
+    echo(f'manufacturers: {n}')
+
+    first_product = _next_id(cursor, 'Product', 'product_id')
+    product_ids = range(first_product, first_product + counts['products'])
+    n = _bulk_insert(db, cursor, 'Product', ['product_id', 'name', 'description', 'rating'], (
+        (product_id,
+         f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {product_id}',
+         ' '.join(rng.choice(WORDS) for _ in range(8)),
+         0)
+        for product_id in product_ids
+    ), chunk_size)
+    echo(f'products: {n}')
+
+    # Popular manufacturers carry more products; each product has one to three offers
+    manufacturer_sampler = SkewedSampler(manufacturer_ids, 0.8, rng)
+    first_pm = _next_id(cursor, 'ProductManufacturer', 'product_manufacturer_id')
+    product_offers = {}
+    pm_rows = []
+    pm_id = first_pm
+    for product_id in product_ids:
+        offers = []
+        for manufacturer_id in manufacturer_sampler.sample_distinct(rng.choices([1, 2, 3], [60, 30, 10])[0]):
+            pm_rows.append((pm_id, product_id, manufacturer_id, round(rng.uniform(5, 2000), 2), rng.randint(0, 500)))
+            offers.append(pm_id)
+            pm_id += 1
+        product_offers[product_id] = offers
+    n = _bulk_insert(db, cursor, 'ProductManufacturer',
+                     ['product_manufacturer_id', 'product_id', 'manufacturer_id', 'price', 'stock'],
+                     pm_rows, chunk_size)
+    pm_prices = {row[0]: row[3] for row in pm_rows}
+    del pm_rows
+    echo(f'product_manufacturers: {n}')
+
+    product_sampler = SkewedSampler(product_ids, 1.1, rng)
+    user_sampler = SkewedSampler(user_ids, 0.9, rng)
+
+    # Orders with their payment and shipping rows, generated chunk by chunk so memory stays flat
+    first_order = _next_id(cursor, '`Order`', 'order_id')
+    first_payment = _next_id(cursor, 'Payment', 'payment_id')
+    first_shipping = _next_id(cursor, 'Shipping', 'shipping_id')
+    payment_id = first_payment
+    shipping_id = first_shipping
+    totals = {'orders': 0, 'payments': 0, 'shippings': 0}
+    order_columns = ['order_id', 'user_id', 'product_manufacturer_id', 'order_date', 'order_quantity', 'status']
+    payment_columns = ['payment_id', 'order_id', 'payment_date', 'amount_paid', 'payment_method']
+    shipping_columns = ['shipping_id', 'order_id', 'address_id', 'shipping_date', 'estimated_delivery', 'status']
+
+    for chunk_start in range(0, counts['orders'], chunk_size):
+        orders, payments, shippings = [], [], []
+        for order_id in range(first_order + chunk_start,
+                              first_order + min(chunk_start + chunk_size, counts['orders'])):
+            user_id = user_sampler.sample()
+            pm = rng.choice(product_offers[product_sampler.sample()])
+            quantity = rng.choices([1, 2, 3, 4], [75, 15, 7, 3])[0]
+            ordered_at = _random_date(rng, now, 730)
+            status = rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0]
+            orders.append((order_id, user_id, pm, ordered_at, quantity, status))
+
+            if status != 'Cancelled' and (status != 'Pending' or rng.random() < 0.5):
+                payments.append((payment_id, order_id, ordered_at + timedelta(minutes=rng.randint(1, 120)),
+                                 round(pm_prices[pm] * quantity, 2), rng.choice(PAYMENT_METHODS)))
+                payment_id += 1
+
+            if status in ('Shipped', 'Delivered'):
+                first_address_id, address_count = user_addresses[user_id]
+                shipped_at = ordered_at + timedelta(days=rng.randint(1, 3))
+                shippings.append((shipping_id, order_id, first_address_id + rng.randrange(address_count),
+                                  shipped_at, shipped_at + timedelta(days=rng.randint(2, 7)), status))
+                shipping_id += 1
+
+        totals['orders'] += _bulk_insert(db, cursor, '`Order`', order_columns, orders, chunk_size)
+        totals['payments'] += _bulk_insert(db, cursor, 'Payment', payment_columns, payments, chunk_size)
+        totals['shippings'] += _bulk_insert(db, cursor, 'Shipping', shipping_columns, shippings, chunk_size)
+    echo(f'orders: {totals["orders"]}, payments: {totals["payments"]}, shippings: {totals["shippings"]}')
+
+    # Reviews: active users write more, each user reviews a product at most once
+    def review_rows():
+        remaining = counts['reviews']
+        # Most active users first; nobody is visited twice so (user_id, product_id) stays unique
+        for user_id in user_sampler.ids:
+            if remaining <= 0:
+                return
+            k = min(remaining, max(1, int(rng.paretovariate(1.5))), 50)
+            for product_id in product_sampler.sample_distinct(k):
+                yield (user_id, product_id, rng.choices(range(6), RATING_WEIGHTS)[0],
+                       rng.choice(['Great!', 'Works as described.', 'Not bad.', 'Would not buy again.']),
+                       _random_date(rng, now, 730))
+            remaining -= k
+
+    n = _bulk_insert(db, cursor, 'Review', ['user_id', 'product_id', 'rating', 'review_text', 'review_date'],
+                     review_rows(), chunk_size)
+    echo(f'reviews: {n}')
+
+    def cart_rows():
+        for user_id in itertools.islice(user_sampler.ids, counts['cart_users']):
+            for product_id in product_sampler.sample_distinct(rng.choices([1, 2, 3, 5], [50, 30, 15, 5])[0]):
+                yield (user_id, rng.choice(product_offers[product_id]), rng.randint(1, 3))
+
+    n = _bulk_insert(db, cursor, 'Cart', ['user_id', 'product_manufacturer_id', 'quantity'], cart_rows(), chunk_size)
+    echo(f'cart lines: {n}')
+
+    rated = rebuild_rating_stats(cursor)
+    db.commit()
+    cursor.execute('SET unique_checks = 1')
+    echo(f'rating aggregates: {rated}')
+
+
+@db_cli.command('seed')
+@click.option('--scale', type=float, default=1.0, show_default=True,
+              help='Multiplier on the base row counts (100 gives ~10M orders).')
+@click.option('--seed', 'random_seed', type=int, default=42, show_default=True, help='Random seed.')
+@click.option('--chunk-size', type=int, default=5000, show_default=True, help='Rows per multi-row INSERT.')
+@click.option('--password', default='password', show_default=True, help='Password for every generated user.')
+def seed_command(scale, random_seed, chunk_size, password):
+    """Generate a synthetic dataset with skewed popularity and activity."""
+    seed_database(get_db(), scale=scale, seed=random_seed, chunk_size=chunk_size, password=password,
+                  echo=click.echo)
@@ -0,0 +1,40 @@
+import pymysql
+from flask import Response, current_app, g, request, stream_with_context
+from db import get_db
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Rows are flushed to the client in batches of this size
+STREAM_BATCH_SIZE = 500
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_query(query, params=None):
+    db = get_db()
+    # Unbuffered cursor: rows are read off the wire as the client consumes them
+    cursor = db.cursor(pymysql.cursors.SSDictCursor)
+    cursor.execute(query, params)
+
+    def generate():
+        dumps = current_app.json.dumps
+        finished = False
+        try:
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    finished = True
+                    break
+                yield ''.join(dumps(row) + '\n' for row in rows)
+        finally:
+            if finished:
+                cursor.close()
+            else:
+                # Draining the rest of a huge result would take as long as sending it,
+                # so drop the connection instead of returning it to the pool
+                g.db_discard = True
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)